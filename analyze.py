@@ -0,0 +1,80 @@
+"""
+Module analyze.py
+=================
+
+Searches every position of a file of move sequences and writes the results as JSON lines, as they're ready
+(Run from the project's root directory, see src/analysis.py for the input format)
+"""
+import argparse
+import json
+import sys
+from time import perf_counter
+
+from src.analysis import analyse_stream
+from src.constants import COLS, ROWS, WIN_LENGTH
+from src.game import Game
+from src.parallel import shutdown_pool
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+def parse_depth(text: str) -> int:
+    """
+    :param text:    A difficulty level (e.g. 'hard') or a number of plies
+    :return: The search depth described by :text:
+    """
+    if text in Game.difficulty:
+        return Game.difficulty[text]
+    try:
+        depth = int(text)
+    except ValueError:
+        depth = 0
+    if depth < 1:
+        raise argparse.ArgumentTypeError(f"'{text}' is not a difficulty level ({', '.join(Game.difficulty)}) "
+                                         f"or a positive number of plies!")
+    return depth
+
+
+def main() -> None:
+    """
+    The program's main function
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Analyses Connect4Py positions in bulk')
+    parser.add_argument('input', type=argparse.FileType('r'),
+                        help="A file of move strings or JSON lines ('-' reads standard input)")
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'), default=sys.stdout,
+                        help='The file the results are written to (Standard output by default)')
+    parser.add_argument('-d', '--depth', type=parse_depth, default=None,
+                        help="A difficulty level or a number of plies ('medium' if there's no time budget)")
+    parser.add_argument('-t', '--time', type=float, default=None, help='The search time of each position (seconds)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='The number of worker processes')
+    parser.add_argument('-c', '--chunk-size', type=int, default=64, help='The number of positions per worker task')
+    parser.add_argument('--rows', type=int, default=ROWS)
+    parser.add_argument('--cols', type=int, default=COLS)
+    parser.add_argument('--length', type=int, default=WIN_LENGTH)
+    args = parser.parse_args()
+    if args.chunk_size < 1:
+        parser.error('The chunk size has to be positive!')
+    depth = args.depth if args.depth is not None or args.time is not None else Game.difficulty['medium']
+    start, positions, errors, nodes = perf_counter(), 0, 0, 0
+    try:
+        for record in analyse_stream(args.input, depth, args.time, args.workers, args.chunk_size,
+                                     (args.rows, args.cols, args.length)):
+            args.output.write(json.dumps(record) + '\n')
+            args.output.flush()
+            positions += 1
+            errors += 'error' in record
+            nodes += record.get('nodes', 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_pool()
+    elapsed = perf_counter() - start
+    print(f'Analysed {positions} positions ({errors} errors, {nodes} nodes) in {elapsed:.1f}s '
+          f'({positions / elapsed if elapsed else 0:.1f} positions/s)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Module arena.py
+===============
+
+Plays engine settings against each other without a display and reports their strength and speed
+(Run from the project's root directory)
+"""
+import argparse
+from pathlib import Path
+
+from src.arena import EngineConfig, format_report, run_match
+from src.constants import COLS, ENGINES, ROWS, WIN_LENGTH
+from src.evaluation import load_weights
+from src.parallel import shutdown_pool
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+def parse_engine(text: str) -> EngineConfig:
+    """
+    :param text:    An engine description, NAME=[ENGINE:]DIFFICULTY[@SECONDS] (e.g. 'fast=hard@0.1' or
+                    'tree=mcts:hard')
+    :return: The engine described by :text:
+    """
+    name, _, setting = text.partition('=')
+    setting, _, seconds = (setting or name).partition('@')
+    engine, _, depth = setting.rpartition(':')
+    try:
+        return EngineConfig(name, depth or None, float(seconds) if seconds else None, engine=engine or ENGINES[0])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main() -> None:
+    """
+    The program's main function
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Plays Connect4Py engines against each other')
+    parser.add_argument('engines', nargs='+', type=parse_engine,
+                        help="Engines to compare, as NAME=[ENGINE:]DIFFICULTY[@SECONDS] (e.g. 'easy', "
+                             "'fast=hard@0.1' or 'tree=mcts:hard', ENGINE is alphabeta or mcts)")
+    parser.add_argument('-g', '--games', type=int, default=100, help='The number of games per pair of engines')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='The number of worker processes')
+    parser.add_argument('-o', '--opening', type=int, default=2, help='The number of random opening moves per game')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='The seed used to generate the openings')
+    parser.add_argument('--weights', action='append', default=[], metavar='NAME=FILE',
+                        help='Evaluation weights of an engine (See evaluation.load_weights()), can be repeated')
+    parser.add_argument('--rows', type=int, default=ROWS)
+    parser.add_argument('--cols', type=int, default=COLS)
+    parser.add_argument('--length', type=int, default=WIN_LENGTH)
+    args = parser.parse_args()
+    if len({engine.name for engine in args.engines}) != len(args.engines):
+        parser.error('Engine names have to be unique!')
+    engines = {engine.name: engine for engine in args.engines}
+    for text in args.weights:
+        name, _, path = text.partition('=')
+        if name not in engines or not path:
+            parser.error(f"'{text}' doesn't give the weights of one of the engines (NAME=FILE)!")
+        try:
+            engines[name].weights = load_weights(Path(path))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    try:
+        standings = run_match(args.engines, args.games, args.workers, args.opening, args.seed, args.rows, args.cols,
+                              args.length)
+    finally:
+        shutdown_pool()
+    print(format_report(standings))
+
+
+if __name__ == '__main__':
+    main()
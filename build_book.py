@@ -0,0 +1,44 @@
+"""
+Module build_book.py
+====================
+
+Builds the opening book used by Board.negamax() (Run from the project's root directory)
+"""
+import argparse
+from pathlib import Path
+from time import perf_counter
+
+from src.book import build_book
+from src.constants import COLS, ROWS, WIN_LENGTH, book_path
+from src.parallel import shutdown_pool
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+def main() -> None:
+    """
+    The program's main function
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Builds an opening book for Connect4Py')
+    parser.add_argument('-o', '--output', type=Path, default=book_path, help='The path of the book file')
+    parser.add_argument('-p', '--plies', type=int, default=6, help='The number of moves covered by the book')
+    parser.add_argument('-d', '--depth', type=int, default=12, help='The search depth of each position')
+    parser.add_argument('-t', '--time', type=float, default=None, help='The search time of each position (seconds)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='The number of worker processes')
+    parser.add_argument('--rows', type=int, default=ROWS)
+    parser.add_argument('--cols', type=int, default=COLS)
+    parser.add_argument('--length', type=int, default=WIN_LENGTH)
+    args = parser.parse_args()
+    start = perf_counter()
+    try:
+        count = build_book(args.output, args.plies, args.depth, args.time, args.workers, args.rows, args.cols,
+                           args.length)
+    finally:
+        shutdown_pool()
+    print(f'Wrote {count} positions to {args.output} in {perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Module client.py
+================
+
+Plays scripted games against a game server on localhost and reports their results and latencies
+(Run from the project's root directory, --spawn starts its own server so nothing else has to be running)
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from typing import Any, Dict, List
+
+from src.client import GameClient, play_scripted_game
+from src.constants import COLS, ENGINES, ROWS, SERVER_HOST, SERVER_PORT, WIN_LENGTH
+from src.game import Game
+from src.parallel import shutdown_pool
+from src.server import GameServer
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Plays :args.games: human-vs-engine games and :args.engine_games: engine-vs-engine games at once, spread over
+    :args.connections: connections
+    :param args:    The parsed command line
+    :return: The number of games won by each side, the client's latency percentiles and the server's statistics
+    """
+    server = None
+    if args.spawn:
+        server = GameServer(args.host, 0, args.workers)
+        await server.start()
+        args.port = server.port
+    clients = [await GameClient().connect(args.host, args.port) for _ in range(args.connections)]
+    rng = random.Random(args.seed)
+    settings = {'rows': args.rows, 'cols': args.cols, 'length': args.length, 'depth': args.depth,
+                'move_time': args.move_time, 'time_limit': args.time_limit,
+                'engine': args.engine[0] if len(args.engine) == 1 else args.engine}
+    games: List[List[bool]] = [[i % 2 == 1, i % 2 == 0] for i in range(args.games)] + \
+        [[True, True]] * args.engine_games
+    try:
+        states = await asyncio.gather(*(play_scripted_game(clients[i % len(clients)], random.Random(rng.random()),
+                                                           engines, **settings)
+                                        for i, engines in enumerate(games)))
+        stats = await clients[0].request('stats')
+    finally:
+        for client in clients:
+            await client.close()
+        if server is not None:
+            await server.close()
+    results = Counter('draw' if state['winner'] is None else
+                      ('engine' if state['engines'][state['winner']] else 'human') + ' (' + state['reason'] + ')'
+                      for state in states)
+    return {
+        'results': dict(results),
+        'client_latency': {f'connection {i}': client.latency.summary() for i, client in enumerate(clients)},
+        'server': {key: stats[key] for key in ('games', 'pending', 'max_pending', 'latency')}
+    }
+
+
+def main() -> None:
+    """
+    The program's main function
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Plays scripted games against a Connect4Py game server')
+    parser.add_argument('--host', default=SERVER_HOST, help="The server's address")
+    parser.add_argument('-p', '--port', type=int, default=SERVER_PORT, help="The server's port")
+    parser.add_argument('--spawn', action='store_true', help='Start a server on a free port for this run')
+    parser.add_argument('-w', '--workers', type=int, default=None, help="The spawned server's worker processes")
+    parser.add_argument('-g', '--games', type=int, default=10, help='The number of human-vs-engine games')
+    parser.add_argument('-e', '--engine-games', type=int, default=2, help='The number of engine-vs-engine games')
+    parser.add_argument('-c', '--connections', type=int, default=2, help='The number of connections to the server')
+    parser.add_argument('-d', '--depth', choices=Game.difficulty, default=None, help="The engines' difficulty")
+    parser.add_argument('--engine', nargs='+', choices=ENGINES, default=[ENGINES[0]],
+                        help="The engines' search algorithm, or one per player (e.g. --engine alphabeta mcts)")
+    parser.add_argument('-t', '--move-time', type=float, default=None, help='The search time of each engine move')
+    parser.add_argument('-l', '--time-limit', type=float, default=None, help="Each player's time for a whole game")
+    parser.add_argument('-s', '--seed', type=int, default=None, help='The seed of the human players')
+    parser.add_argument('--rows', type=int, default=ROWS)
+    parser.add_argument('--cols', type=int, default=COLS)
+    parser.add_argument('--length', type=int, default=WIN_LENGTH)
+    args = parser.parse_args()
+    if args.connections < 1:
+        parser.error('At least one connection is needed!')
+    if len(args.engine) > 2:
+        parser.error('--engine takes one engine, or one per player!')
+    try:
+        print(json.dumps(asyncio.run(run(args)), indent=2))
+    finally:
+        shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,18 +4,29 @@ Module main.py
 
 This module contains the game loop and event handling code
 """
+import argparse
+import asyncio
 import logging
 import math
 import os
 import pprint
 import sys
-from typing import Any, Callable, Union
+from time import perf_counter, time
+from typing import Any, Callable, Dict, Union
 
+import pygame
 import pygame.locals as pygl
 
+from src.assets import AssetGroup
+from src.background import BackgroundAI
 from src.board import *
+from src.book import OpeningBook
 from src.constants import *
+from src.evaluation import load_weights
+from src.parallel import shutdown_pool
 from src.player import Player
+from src.records import GameRecord, append_record
+from src.scheduler import FrameScheduler
 
 __version__ = '0.1'
 __author__ = 'Eric G.D'
@@ -23,16 +34,18 @@ __author__ = 'Eric G.D'
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'True'
 os.environ['SDL_VIDEO_CENTERED'] = 'True'
 
+log_path.parent.mkdir(exist_ok=True)
 logging.basicConfig(filemode='a',
                     filename=str(log_path),
                     format='%(asctime)s - %(levelname)s - %(message)s',
                     level=logging.INFO)
 
 
-def generate_resolutions(res: ResDict = None) -> ResDict:
+def generate_resolutions(res: ResDict = None, dimensions: Tuple[int, int] = BOARD_DIMENSIONS) -> ResDict:
     """
     Generates a dictionary that contains the resolutions of each asset relative to the window size
-    :param res: The dictionary of resolutions to be updated
+    :param res:         The dictionary of resolutions to be updated
+    :param dimensions:  The number of rows and columns in the board
     :return: A reference to :res:
     """
     info = pygame.display.Info()
@@ -41,11 +54,13 @@ def generate_resolutions(res: ResDict = None) -> ResDict:
         res = {}
     screen, window = (current_res, tuple(x // 2 for x in current_res)) \
         if pygame.display.get_surface() is None or 'screen' not in res.keys() else (res['screen'], current_res)
-    token = (math.gcd(*window),) * 2
+    # Large boards shrink the tokens so that the board fits in the window with room for the extra token above it
+    # (The board is centered, so that room is left below it as well)
+    token = (min(math.gcd(*window), window[0] // dimensions[1], window[1] // (dimensions[0] + 2)),) * 2
     res.update({
         'screen': screen,
         'window': window,
-        'margin': tuple((window[i] - (BOARD_DIMENSIONS[1 - i] * token[i])) // 2 for i in range(2)),
+        'margin': tuple((window[i] - (dimensions[1 - i] * token[i])) // 2 for i in range(2)),
         'token': token,
         'board': token
     })
@@ -56,20 +71,17 @@ def generate_resolutions(res: ResDict = None) -> ResDict:
 
 def generate_images(res: ResDict, imgs: ImageDict = None) -> ImageDict:
     """
-    Loads assets from ASSETS_PATH into surface objects scaled by the resolutions from :resolutions:
+    Creates a lazily loaded group of surface objects for each asset prefix in :res:, or rescales the groups in :imgs:
+    (Images are only loaded and scaled when they're first used, see AssetGroup)
     :param res:     Resolutions dictionary generated by generate_resolutions
-    :param imgs:    The dictionary to save the surface objects to
+    :param imgs:    The dictionary to save the image groups to
     :return: A reference to :imgs:
     """
     if not imgs:
         keys = tuple(res.keys())[3:]  # Ignore screen, display and margin
-        imgs = {key: {} for key in keys}
-    for f in ASSETS_PATH.glob('*.png'):
-        if f == icon_path:
-            continue
-        prefix, suffix = f.stem.split('_')
-        if prefix in imgs.keys():
-            imgs[prefix][suffix] = load_image(f, res[prefix])
+        imgs = {key: AssetGroup(key, res[key]) for key in keys}
+    for prefix, group in imgs.items():
+        group.resolution = res[prefix]
     logging.debug('Image dictionary updated.')
     logging.debug('imgs = %s' % str(imgs))
     return imgs
@@ -86,13 +98,14 @@ def load_image(file_name: Path, res: Resolution = None) -> pygame.Surface:
     return pygame.transform.scale(img, res) if res else img
 
 
-def setup_video() -> Tuple[pygame.Surface, pygame.font.Font]:
+def setup_video(dimensions: Tuple[int, int] = BOARD_DIMENSIONS) -> Tuple[pygame.Surface, pygame.font.Font]:
     """
     Initialises PyGame video system and everything else related to the GUI
+    :param dimensions:  The number of rows and columns in the board
     :return: The game window as a Surface object and the main font object
     """
     pygame.init()
-    Board.resolutions = generate_resolutions(Board.resolutions)
+    Board.resolutions = generate_resolutions(Board.resolutions, dimensions)
     display = pygame.display.set_mode(Board.resolutions['window'])
     pygame.display.set_caption(title)
     pygame.display.set_icon(load_image(icon_path))
@@ -139,37 +152,47 @@ def draw_fps_counter(surface: pygame.Surface, font: pygame.font.Font, clock: 'py
     pygame.display.update(rect)
 
 
+def draw_thinking(surface: pygame.Surface, font: pygame.font.Font, is_thinking: bool) -> None:
+    """
+    Shows an animated "thinking" indicator in the top-right corner of :surface: while the computer is searching
+    :param surface:     The surface to blit the indicator onto
+    :param font:        The font used to render the indicator
+    :param is_thinking: True if the computer is searching, False to erase the indicator
+    :return: None
+    """
+    width, height = font.size('...')
+    rect = pygame.Rect(Board.resolutions['window'][0] - width, 0, width, height)
+    surface.fill(Colors.background, rect)
+    if is_thinking:
+        dots = font.render('.' * (1 + pygame.time.get_ticks() // 500 % 3), False, Colors.text)
+        surface.blit(dots, rect)
+    pygame.display.update(rect)
+
+
 def exit_game():
     """
     Exits the program
     :return: None
     """
     logging.info(LOG_MESSAGE.format('###', 'END OF PROGRAM'))
+    shutdown_pool()
     pygame.quit()
     sys.exit()
 
 
-def handle_events(board: Board, on_click: Callable[[Board, Position], Any] = None) -> Any:
+async def handle_events(scheduler: FrameScheduler, handlers: Dict[int, Callable[[pygame.event.Event], Any]]) -> None:
     """
-    Handles all events relevant to the game
-    :param board:       The game board
-    :param on_click:    The function to call if a click was registered
-    :return: The return value of :on_click: if it was specified and a MOUSEBUTTONUP event was handled, None otherwise
+    Task that dispatches pygame's events once per frame, until it's cancelled
+    :param scheduler:   The scheduler that renders the frames
+    :param handlers:    The function to call for each event type (Other events are ignored)
+    :return: None
     """
-    last_click = None
-    queue = pygame.event.get() if pygame.event.peek() else (pygame.event.wait(),)
-    # If there are no events then there is no need to keep running the game loop
-
-    switch = {
-        pygl.QUIT: exit_game,
-        pygl.MOUSEMOTION: board.set_extra_token,
-        pygl.MOUSEBUTTONUP: pygame.mouse.get_pos
-    }
-
-    for event in queue:
-        val = switch.get(event.type, lambda *args: None)()
-        last_click = val if isinstance(val, tuple) else last_click
-    return on_click(board, last_click) if last_click and on_click else last_click
+    while True:
+        for event in pygame.event.get():
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+        await scheduler.next_frame()
 
 
 def human_turn(board: Board, mouse_pos: Position) -> int:
@@ -190,31 +213,109 @@ def human_turn(board: Board, mouse_pos: Position) -> int:
     return out
 
 
-def game_loop(display: pygame.Surface, font: pygame.font.Font, players: Tuple[Player, Player]) -> Union[Player, None]:
-    """
-    The main game loop
-    :param display: The game window's surface object
-    :param font:    The font object used to render messages
-    :param players: A tuple containing all of the players
-    :return: The player that won the current game
-    """
-    board = Board(ROWS, COLS, players)
-    board.draw(display, FPS)
-    winner = None
-    in_game = True
-    while in_game:
-        current_player = board.get_current_player()
-        mouse = handle_events(board)
-        column = human_turn(board, mouse) if current_player.is_human else board.negamax()
-        if column != -1:
-            board.insert(display, column, current_player.color)
-        winning_player = board.get_winning_player()
-        if winning_player is not None or board.is_full():
-            winner = winning_player
-            in_game = False
-        board.draw(display, FPS, extra_token=current_player.color)
+async def game_loop(display: pygame.Surface, font: pygame.font.Font, players: Tuple[Player, Player],
+                    scheduler: FrameScheduler, handlers: Dict[int, Callable[[pygame.event.Event], Any]],
+                    geometry: Geometry = (ROWS, COLS, WIN_LENGTH), record_path: Path = None) -> Union[Player, None]:
+    """
+    Plays a single game, while :scheduler: draws the board and the AI searches in the background
+    :param display:     The game window's surface object
+    :param font:        The font object used to render messages
+    :param players:     A tuple containing all of the players
+    :param scheduler:   The scheduler that renders the frames
+    :param handlers:    The event handlers used by handle_events(), the game adds its own while it's running
+    :param geometry:    The number of rows and columns in the board and the number of tokens in a row needed to win
+    :param record_path: The record store the game is appended to once it's over (See records.py), None to not record
+                        it
+    :return: The player that won the game
+    """
+    board = Board(*geometry[:2], players, geometry[2])
+    ai = BackgroundAI()
+    started, think_times = time(), []
+    has_computer = not all(player.is_human for player in players)
+    clicks: asyncio.Queue = asyncio.Queue()
+    is_dropping = False
+    current_player = board.get_current_player()
+
+    def render() -> None:
+        board.draw(display, extra_token=current_player.color)
+        if has_computer:
+            draw_thinking(display, font, ai.is_thinking)
         # draw_fps_counter(display, font, Board.clock)
-    return winner
+
+    handlers[pygl.MOUSEMOTION] = lambda event: None if is_dropping else board.set_extra_token()
+    handlers[pygl.MOUSEBUTTONUP] = lambda event: clicks.put_nowait(event.pos)
+    scheduler.add_renderer(render)
+    try:
+        while True:
+            current_player = board.get_current_player()
+            turn_start = perf_counter()
+            if current_player.is_human:
+                if has_computer:
+                    ai.ponder(board)  # Search the computer's answers while the human is deciding
+                while not clicks.empty():  # Ignore clicks made before the human's turn
+                    clicks.get_nowait()
+                column = -1
+                while column == -1:
+                    column = human_turn(board, await clicks.get())
+            else:
+                column = await ai.choose(board)
+            think_times.append(perf_counter() - turn_start)
+            is_dropping = True
+            await board.drop_token(column, scheduler)
+            is_dropping = False
+            board.insert(None, column, current_player.color)
+            board.set_extra_token()
+            winning_color = board.get_winning_player()
+            if winning_color is not None or board.is_full():
+                if record_path is not None:
+                    entries = [(player.color, player.is_human, player.engine,
+                                0 if player.is_human else ai.limit(player.engine),
+                                None if player.is_human else ai.time_budget) for player in players]
+                    try:
+                        append_record(record_path, GameRecord.from_game(board, entries, think_times, started))
+                    except ValueError as e:  # e.g. A store written by an older version
+                        logging.warning(f'The game was not recorded: {e}')
+                return next((player for player in players if player.color == winning_color), None)
+    finally:
+        scheduler.remove_renderer(render)
+        del handlers[pygl.MOUSEMOTION], handlers[pygl.MOUSEBUTTONUP]
+        ai.stop_pondering()
+
+
+async def play(display: pygame.Surface, font: pygame.font.Font, geometry: Geometry = (ROWS, COLS, WIN_LENGTH)) \
+        -> None:
+    """
+    Plays games until the window is closed
+    :param display:     The game window's surface object
+    :param font:        The font object used to render messages
+    :param geometry:    The number of rows and columns in the board and the number of tokens in a row needed to win
+    :return: None
+    """
+    scheduler = FrameScheduler(FPS)
+    handlers = {pygl.QUIT: lambda event: scheduler.stop()}
+    players = player_menu()
+
+    async def play_games() -> None:
+        while True:
+            winner = await game_loop(display, font, players, scheduler, handlers, geometry, records_path)
+            if winner is not None:
+                winner.score += 1
+                logging.info(f'# {winner!s} wins!')
+                logging.debug(', '.join(f'{player!s}: {player.score}' for player in players))
+            else:
+                logging.info("# It's a tie!")
+            # end_message(winner)
+            logging.info(LOG_MESSAGE.format('##', 'Starting new game...'))
+
+    tasks = asyncio.ensure_future(handle_events(scheduler, handlers)), asyncio.ensure_future(play_games())
+    for task in tasks:
+        task.add_done_callback(lambda task: scheduler.stop())  # Only happens if a task raised an exception
+    await scheduler.run()
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            raise result
 
 
 def main() -> None:
@@ -222,19 +323,21 @@ def main() -> None:
     The program's main function
     :return: None
     """
+    parser = argparse.ArgumentParser(description=title)
+    parser.add_argument('--rows', type=int, default=ROWS, help='The number of rows in the board')
+    parser.add_argument('--cols', type=int, default=COLS, help='The number of columns in the board')
+    parser.add_argument('--length', type=int, default=WIN_LENGTH, help='The number of tokens in a row needed to win')
+    args = parser.parse_args()
+    if min(args.rows, args.cols) < args.length or args.length < 2:
+        parser.error(f'A {args.rows}x{args.cols} board is too small to connect {args.length}!')
     logging.info(LOG_MESSAGE.format('###', 'START OF PROGRAM'))
-    display, font = setup_video()
-    players = player_menu()
-    while True:
-        winner = game_loop(display, font, players)
-        if winner is not None:
-            winner.score += 1
-            logging.info(f'# {winner!s} wins!')
-            logging.debug(', '.join(f'{player!s}: {player.score}' for player in players))
-        else:
-            logging.info("# It's a tie!")
-        # end_message(winner)
-        logging.info(LOG_MESSAGE.format('##', 'Starting new game...'))
+    display, font = setup_video((args.rows, args.cols))
+    if book_path.is_file():
+        Board.book = OpeningBook(book_path)
+    if weights_path.is_file():
+        Board.weights = load_weights(weights_path)
+    asyncio.run(play(display, font, (args.rows, args.cols, args.length)))
+    exit_game()
 
 
 if __name__ == '__main__':
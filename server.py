@@ -0,0 +1,50 @@
+"""
+Module server.py
+================
+
+Hosts headless games for clients on a local socket until it's interrupted (Run from the project's root directory, see
+src/server.py for the protocol and client.py for a scripted client)
+"""
+import argparse
+import asyncio
+import logging
+
+from src.book import OpeningBook
+from src.constants import SERVER_HOST, SERVER_MAX_GAMES, SERVER_MAX_INFLIGHT, SERVER_PORT, book_path
+from src.game import Game
+from src.parallel import shutdown_pool
+from src.server import GameServer
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+def main() -> None:
+    """
+    The program's main function
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Hosts Connect4Py games over a local socket')
+    parser.add_argument('--host', default=SERVER_HOST, help='The address to listen on')
+    parser.add_argument('-p', '--port', type=int, default=SERVER_PORT, help='The port to listen on')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='The number of worker processes')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='The number of searches submitted to the workers at once')
+    parser.add_argument('--max-games', type=int, default=SERVER_MAX_GAMES, help='The number of games kept at once')
+    parser.add_argument('--max-inflight', type=int, default=SERVER_MAX_INFLIGHT,
+                        help='The number of requests of a connection that run at once')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if book_path.is_file():
+        Game.book = OpeningBook(book_path)
+    server = GameServer(args.host, args.port, args.workers, args.max_pending, args.max_games, args.max_inflight)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
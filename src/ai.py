@@ -4,44 +4,268 @@ Module ai.py
 
 This module contains all of the functions related to the computer's AI and the NegaMax algorithm
 """
-from typing import Set
+from functools import lru_cache
+from math import inf
+from time import perf_counter
+from typing import Dict, Iterable, List, Tuple
 
-from src.constants import GameState, MAX_SCORE
+from src.bitboard import BitBoard, column_masks
+from src.constants import MAX_HEURISTIC, MAX_SCORE
+from src.evaluation import pattern_table, window_patterns
+from src.transposition import EXACT, LOWER, UPPER, TranspositionTable
 
-__all__ = ['has_won', 'evaluate', 'alpha_beta']
+__all__ = ['SearchContext', 'SearchTimeout', 'has_won', 'evaluate', 'order_moves', 'alpha_beta',
+           'iterative_deepening', 'principal_variation']
 __version__ = '0.1'
 __author__ = 'Eric G.D'
 
 
-# TODO: Implement this module's fumctions
+class SearchContext:
+    """
+    class SearchContext:
+    --------------------
+
+    The state that is shared by every node of a search:
+    * The transposition table (None disables it)
+    * The time (perf_counter) at which the search has to stop (None searches without a time limit)
+    * The number of nodes that were visited
+    * The killer moves (The last two moves that caused a cutoff at each ply) and the history table (How often each
+      player's moves caused a cutoff, weighted by depth), used for move ordering
+    * The number of cutoffs, and how many of them were caused by the first move that was searched
+    * When the search started, the table's counters at that time and the depth, duration and number of nodes of
+      each completed iteration of iterative_deepening(), used by SearchStats
+    """
+    __slots__ = ('table', 'deadline', 'nodes', 'killers', 'history', 'cutoffs', 'first_move_cutoffs', 'start',
+                 'table_probes', 'table_hits', 'iterations')
+
+    def __init__(self, table: TranspositionTable = None, deadline: float = None):
+        self.table: TranspositionTable = table
+        self.deadline: float = deadline
+        self.nodes: int = 0
+        self.killers: Dict[int, List[int]] = {}
+        self.history: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        self.cutoffs: int = 0
+        self.first_move_cutoffs: int = 0
+        self.start: float = perf_counter()
+        self.table_probes: int = table.probes if table is not None else 0
+        self.table_hits: int = table.hits if table is not None else 0
+        self.iterations: List[Tuple[int, float, int]] = []
 
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """
+        :return: The fraction of cutoffs that happened on the first move searched (1 means perfect move ordering)
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
 
-def has_won(board: GameState) -> bool:
+    def add_cutoff(self, board: BitBoard, column: int, depth: int, is_first: bool) -> None:
+        """
+        Updates the move ordering heuristics after :column: caused a cutoff in :board:
+        :param board:       The position where the cutoff happened
+        :param column:      The move that caused the cutoff
+        :param depth:       The remaining search depth at :board:
+        :param is_first:    True if :column: was the first move searched in :board:
+        :return: None
+        """
+        self.cutoffs += 1
+        self.first_move_cutoffs += is_first
+        killers = self.killers.setdefault(board.moves, [-1, -1])
+        if killers[0] != column:
+            killers[0], killers[1] = column, killers[0]
+        history = self.history[board.player]
+        history[column] = history.get(column, 0) + depth * depth
+
+
+class SearchTimeout(Exception):
+    """
+    Raised by alpha_beta() when a search runs past its deadline
+    """
+
+
+def has_won(board: BitBoard, player: int = None) -> bool:
     """
     :param board:   The game board
-    :return: True if there is a row of 4 pieces, False otherwise
+    :param player:  The index of the player to check, defaults to the player who made the last move
+    :return: True if :player: has a row of :board:.length pieces, False otherwise
+    """
+    if player is None:
+        player = 1 - board.player
+        if board.played:  # The game ends on the first win, so only the lines through the last move can be complete
+            return board.wins_at(board.played[-1], player)
+    return board.connected(board.masks[player])
+
+
+def evaluate(board: BitBoard) -> int:
+    """
+    Scores every window (Line of :board:.length cells) by looking its occupancy pattern up in a pattern table (See
+    evaluation.py). Boards with an EvalState attached use its running score and table, others are scanned in full
+    with the default table. The score is clamped to MAX_HEURISTIC, so it can't be mistaken for a win.
+    :param board: A game board generated by Board.convert()
+    :return: The heuristic value of the board relative to a draw (0), from the perspective of the player to move
+    """
+    if has_won(board):  # The player to move can't have a line, the game ends on the first one
+        return -MAX_SCORE
+    if board.evaluation is not None:
+        score = board.evaluation.score
+    else:
+        first, second = board.masks
+        table, score = pattern_table(board.length), 0
+        for window in window_patterns(board.rows, board.cols, board.length):
+            score += table[sum(place * (first >> bit & 1 or 2 * (second >> bit & 1)) for bit, place in window)]
+    score = max(-MAX_HEURISTIC, min(MAX_HEURISTIC, score))
+    return -score if board.player else score
+
+
+@lru_cache()
+def center_distances(cols: int) -> Tuple[int, ...]:
+    """
+    :param cols:    The number of columns in the board
+    :return: The distance of each column from the center of the board (Doubled, so that it's always an integer)
+    """
+    return tuple(abs(2 * column - (cols - 1)) for column in range(cols))
+
+
+def order_moves(board: BitBoard, move_set: Iterable[int], context: SearchContext, table_move: int = -1) -> List[int]:
+    """
+    Sorts the moves of :board: by how likely they are to be the best move:
+    1. The best move stored in the transposition table
+    2. The killer moves of the current ply
+    3. Moves with a higher history score
+    4. Moves closer to the center of the board
+    :param board:       The position the moves will be played in
+    :param move_set:    The columns to sort
+    :param context:     The search's state, containing the killer moves and history table
+    :param table_move:  The best move found for :board: by an earlier search, -1 if there is none
+    :return: A sorted list of the columns in :move_set:
+    """
+    killers = context.killers.get(board.moves, ())
+    history = context.history[board.player]
+    distances = center_distances(board.cols)
+    return sorted(move_set, key=lambda column: (column != table_move, column not in killers,
+                                                -history.get(column, 0), distances[column]))
+
+
+def alpha_beta(board: BitBoard, move_set: Iterable[int], alpha: float, beta: float, depth: int,
+               context: SearchContext = None) -> Tuple[float, int]:
+    """
+    Scores :board: from the perspective of the player to move using NegaMax with alpha-beta pruning.
+    Wins are scored as MAX_SCORE minus the number of moves it took to reach them, so faster wins are preferred.
+    Immediate wins are played without searching, and moves that let the opponent win right away (Not blocking their
+    winning cell, or playing right below it) are never searched (See BitBoard.non_losing_moves()).
+    :param board:       The position to search, moves are played and unplayed in place
+    :param move_set:    The columns to search from this position
+    :param alpha:       The score the player to move is already guaranteed
+    :param beta:        The score the opponent is already guaranteed
+    :param depth:       The maximum search depth (in plies)
+    :param context:     The state shared by the whole search (Transposition table etc.)
+    :return: The score of :board: and the best column to play (-1 if no move was searched)
+    :raises SearchTimeout: If :context:'s deadline has passed
     """
-    return abs(evaluate(board)) == MAX_SCORE
+    if context is None:
+        context = SearchContext()
+    context.nodes += 1
+    if context.deadline is not None and not context.nodes & 0xFF and perf_counter() >= context.deadline:
+        raise SearchTimeout()
+    if has_won(board):
+        return -(MAX_SCORE - board.moves), -1
+    if depth <= 0 or board.is_full():
+        return evaluate(board), -1
+    masks = column_masks(board.rows, board.cols)
+    wins = board.winning_cells(board.player) & board.possible()
+    if wins:
+        move = next((column for column in move_set if wins & masks[column]), -1)
+        if move != -1:
+            return MAX_SCORE - (board.moves + 1), move
+    candidates, all_moves = board.non_losing_moves(), move_set
+    move_set = [column for column in move_set if candidates & masks[column]]
+    if not move_set:  # Every move lets the opponent win on their next move
+        return -(MAX_SCORE - (board.moves + 2)), next(iter(all_moves), -1)
+    table = context.table
+    original_alpha, table_move = alpha, -1
+    if table is not None:
+        key = board.key()
+        entry = table.get(key)
+        if entry is not None:
+            entry_depth, flag, score, table_move = entry
+            if entry_depth >= depth and table_move in move_set:
+                if flag == EXACT:
+                    return score, table_move
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score, table_move
+    best_score, best_move = -inf, -1
+    for i, column in enumerate(order_moves(board, move_set, context, table_move)):
+        board.play(column)
+        score = -alpha_beta(board, board.legal_moves(), -beta, -alpha, depth - 1, context)[0]
+        board.unplay(column)
+        if score > best_score:
+            best_score, best_move = score, column
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            context.add_cutoff(board, column, depth, i == 0)
+            break
+    if table is not None and best_move != -1:
+        flag = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        table.store(key, depth, flag, best_score, best_move)
+    return best_score, best_move
 
 
-def evaluate(board: GameState, color: str = 'red') -> int:
+def principal_variation(board: BitBoard, table: TranspositionTable, max_length: int = None) -> List[int]:
     """
-    :param board: A simplified game board generated by Board.convert()
-    :param color: The current player's token color
-    :return: The heuristic value of the board relative to a draw (0)
+    :param board:       The position the search started from
+    :param table:       The transposition table filled by the search
+    :param max_length:  The maximum number of moves to return
+    :return: The sequence of best moves stored in :table:, starting from :board:
     """
-    return 0  # Placeholder
+    board, pv = board.copy(), []
+    while max_length is None or len(pv) < max_length:
+        entry = table.get(board.key())
+        if entry is None or entry[3] == -1 or not board.can_play(entry[3]) or has_won(board):
+            break
+        pv.append(entry[3])
+        board.play(entry[3])
+    return pv
 
 
-def alpha_beta(board: GameState, color: str, move_set: Set[int], alpha: float, beta: float, depth: int):
+def iterative_deepening(board: BitBoard, move_set: Iterable[int], time_budget: float, context: SearchContext = None,
+                        max_depth: int = None) -> Tuple[float, int, int]:
     """
-    :param board:
-    :param color:
-    :param move_set:
-    :param alpha:
-    :param beta:
-    :param depth:
-    :return:
+    Searches :board: one ply deeper at a time until :time_budget: runs out.
+    Each iteration stores its principal variation in the transposition table, so the next iteration searches the
+    previous best moves first. The first iteration is always completed so that there is a move to return.
+    :param board:       The position to search
+    :param move_set:    The columns to search from this position
+    :param time_budget: The number of seconds that the search may take
+    :param context:     The state shared by the whole search, a transposition table is created if it has none
+    :param max_depth:   The deepest iteration to search, defaults to the number of empty cells
+    :return: The score and best column of the deepest completed iteration and its depth
     """
-    # TODO: Document this function
-    pass
+    if context is None:
+        context = SearchContext()
+    if context.table is None:
+        context.table = TranspositionTable()
+    deadline = perf_counter() + time_budget
+    remaining = board.rows * board.cols - board.moves
+    max_depth = remaining if max_depth is None else min(max_depth, remaining)
+    move_set = list(move_set)
+    score, move, depth = 0, move_set[0] if move_set else -1, 0
+    for iteration in range(1, max_depth + 1):
+        context.deadline = None if iteration == 1 else deadline
+        start, nodes = perf_counter(), context.nodes
+        try:
+            result = alpha_beta(board.copy(), move_set, -inf, inf, iteration, context)
+        except SearchTimeout:
+            break
+        finally:
+            context.deadline = None
+        score, move, depth = *result, iteration
+        context.iterations.append((iteration, perf_counter() - start, context.nodes - nodes))
+        if move in move_set:  # Search the previous iteration's best move first
+            move_set.remove(move)
+            move_set.insert(0, move)
+        if abs(score) >= MAX_SCORE - board.rows * board.cols or perf_counter() >= deadline:
+            break  # The game's result is known or there is no time left for another iteration
+    return score, move, depth
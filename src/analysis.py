@@ -0,0 +1,141 @@
+"""
+Module analysis.py
+==================
+
+This module contains the batch position analysis used by analyze.py, which replays move sequences from a stream of
+lines and searches the resulting positions in the shared process pool, a chunk of positions per task.
+
+Each line is either a move string, one digit per move with columns numbered from 1 (e.g. '4453', boards with at
+most 9 columns), or a JSON object whose 'moves' is a move string or a list of column indexes (Numbered from 0), and
+whose other fields are copied into the result. Empty lines and lines starting with '#' are skipped.
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Tuple, Union
+
+from src.ai import has_won
+from src.bitboard import BitBoard
+from src.constants import COLS, ROWS, WIN_LENGTH
+from src.parallel import get_pool, search_position
+
+__all__ = ['parse_line', 'replay', 'analyse_chunk', 'analyse_stream']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+Record = Dict[str, Any]
+
+
+def parse_line(line: str, number: int) -> Union[Record, None]:
+    """
+    :param line:    A line of the input
+    :param number:  The number of the line in the input, starting at 1
+    :return: The line's number, its moves (As column indexes) and extra fields, or an 'error' if it can't be parsed,
+             None if the line is skipped
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    record: Record = {'line': number}
+    try:
+        if line.startswith('{'):
+            fields = json.loads(line)
+            moves = fields.pop('moves')
+            record.update((key, value) for key, value in fields.items() if key not in ('line', 'error'))
+        else:
+            moves = line
+        if isinstance(moves, str):
+            if not moves.isdigit() or '0' in moves:
+                raise ValueError(f"'{moves}' is not a move string (Columns are numbered from 1 to 9)!")
+            moves = [int(move) - 1 for move in moves]
+        elif not isinstance(moves, list) or not all(isinstance(move, int) for move in moves):
+            raise ValueError("'moves' has to be a move string or a list of column indexes!")
+        record['moves'] = moves
+    except (ValueError, KeyError) as e:
+        record['error'] = str(e) if not isinstance(e, KeyError) else "The line has no 'moves'!"
+    return record
+
+
+def replay(moves: Iterable[int], rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH) -> BitBoard:
+    """
+    :param moves:   The column index of every move, in order
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :param length:  The number of tokens in a row needed to win
+    :return: The position after :moves:
+    :raises ValueError: If one of the moves can't be played (Including moves made after the game was won)
+    """
+    board = BitBoard(rows, cols, length)
+    for index, column in enumerate(moves):
+        if board.played and has_won(board):
+            raise ValueError(f'Move {index + 1} was played after the game was won!')
+        if not 0 <= column < cols or not board.can_play(column):
+            raise ValueError(f"Move {index + 1} can't be played in column {column} (Numbered from 0)!")
+        board.play(column)
+    return board
+
+
+def analyse_chunk(records: List[Record], depth: Union[int, None], time_budget: Union[float, None],
+                  geometry: Tuple[int, int, int] = (ROWS, COLS, WIN_LENGTH),
+                  table_size_mb: float = 16) -> List[Record]:
+    """
+    Runs in a worker process, searches the position of every record that was parsed
+    :param records:         Records made by parse_line()
+    :param depth:           The maximum search depth (in plies), None for no limit (Only with a time budget)
+    :param time_budget:     The number of seconds each search may take, None to search exactly :depth: plies
+    :param geometry:        The number of rows and columns in the board and the number of tokens in a row needed to win
+    :param table_size_mb:   The size of the worker's transposition table
+    :return: :records:, with each position's best move, score and search statistics or an 'error', in order.
+             Positions where the game is over have a 'result' ('win' for the player who made the last move or
+             'draw') instead
+    """
+    for record in records:
+        if 'error' in record:
+            continue
+        try:
+            board = replay(record['moves'], *geometry)
+        except ValueError as e:
+            record['error'] = str(e)
+            continue
+        if board.played and has_won(board):
+            record['result'] = 'win'
+        elif board.is_full():
+            record['result'] = 'draw'
+        else:
+            *_, stats = search_position(board, depth, time_budget, table_size_mb)
+            record.update(stats.as_dict())
+    return records
+
+
+def analyse_stream(lines: Iterable[str], depth: Union[int, None], time_budget: float = None, workers: int = None,
+                   chunk_size: int = 64, geometry: Tuple[int, int, int] = (ROWS, COLS, WIN_LENGTH),
+                   table_size_mb: float = 16) -> Iterator[Record]:
+    """
+    Analyses every position of :lines: in the shared process pool.
+    Lines are only read while fewer than two chunks per worker are queued, so memory use doesn't grow with the input.
+    :param lines:           The input, line by line (See the module's docstring)
+    :param depth:           The maximum search depth (in plies), None for no limit (Only with a time budget)
+    :param time_budget:     The number of seconds each search may take, None to search exactly :depth: plies
+    :param workers:         The number of worker processes, defaults to the number of CPUs
+    :param chunk_size:      The number of positions sent to a worker at once
+    :param geometry:        The number of rows and columns in the board and the number of tokens in a row needed to win
+    :param table_size_mb:   The size of the transposition table in each worker process
+    :return: A generator of the analysis of every line (See analyse_chunk()), in the input's order
+    """
+    workers = workers or os.cpu_count() or 1
+    pool, max_pending = get_pool(workers), 2 * workers
+    records = (record for record in (parse_line(line, number) for number, line in enumerate(lines, 1))
+               if record is not None)
+    pending: Deque[Future] = deque()
+    try:
+        for chunk in iter(lambda: list(islice(records, chunk_size)), []):
+            pending.append(pool.submit(analyse_chunk, chunk, depth, time_budget, geometry, table_size_mb))
+            while len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:  # The generator was closed early or a chunk failed
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,242 @@
+"""
+Module arena.py
+===============
+
+This module contains the headless self-play arena, which plays engine settings against each other in worker
+processes and reports their results and speed
+"""
+import random
+from itertools import combinations
+from math import inf, log10
+from time import perf_counter
+from typing import Dict, List, Sequence, Union
+
+from src.constants import COLS, ENGINES, ROWS, WIN_LENGTH, PatternTable
+from src.game import Game
+from src.parallel import get_pool
+from src.player import Player
+
+__all__ = ['EngineConfig', 'GameResult', 'Standing', 'play_game', 'run_match', 'elo_difference', 'format_report']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+class EngineConfig:
+    """
+    class EngineConfig:
+    -------------------
+
+    A named set of engine settings for the arena: the search algorithm (Game.negamax() or Game.mcts()), its difficulty
+    and time budget, and the evaluation's weights (So tuned weights can be compared with the default ones)
+    """
+
+    def __init__(self, name: str, depth: str = None, time_budget: float = None, weights: PatternTable = None,
+                 engine: str = ENGINES[0]):
+        if depth is not None and depth not in Game.difficulty:
+            raise ValueError(f"'{depth}' is not a difficulty level ({', '.join(Game.difficulty)})!")
+        if engine not in ENGINES:
+            raise ValueError(f"'{engine}' is not an engine ({', '.join(ENGINES)})!")
+        self.name: str = name
+        self.depth: str = depth
+        self.time_budget: float = time_budget
+        self.weights: Union[PatternTable, None] = weights
+        self.engine: str = engine
+
+    def __repr__(self) -> str:
+        return f'EngineConfig({self.name!r}, {self.depth!r}, {self.time_budget!r}, engine={self.engine!r})'
+
+    def choose(self, game: Game) -> int:
+        """
+        :param game:    The game
+        :return: The column this engine plays in :game:
+        """
+        if self.engine == 'mcts':
+            return game.mcts(self.depth, self.time_budget, workers=1)
+        return game.negamax(self.depth, self.time_budget, workers=1, weights=self.weights)
+
+
+class GameResult:
+    """
+    class GameResult:
+    -----------------
+
+    The outcome of a single arena game, the timing lists are indexed by the order the engines played in
+    """
+
+    def __init__(self, engines: Sequence[str], winner: Union[int, None], moves: List[int], engine_moves: List[int],
+                 think_times: List[float], nodes: List[int], search_times: List[float]):
+        self.engines: Sequence[str] = engines
+        self.winner: Union[int, None] = winner  # The index of the winning engine, None for a draw
+        self.moves: List[int] = moves
+        self.engine_moves: List[int] = engine_moves  # The number of moves chosen by each engine (Not the opening)
+        self.think_times: List[float] = think_times
+        self.nodes: List[int] = nodes
+        self.search_times: List[float] = search_times  # Time spent in searches that counted their nodes
+
+
+class Standing:
+    """
+    class Standing:
+    ---------------
+
+    An engine's accumulated results in the arena
+    """
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.wins: int = 0
+        self.draws: int = 0
+        self.losses: int = 0
+        self.moves: int = 0
+        self.think_time: float = 0.0
+        self.nodes: int = 0
+        self.search_time: float = 0.0
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self) -> float:
+        """
+        :return: The fraction of points won, where a draw is worth half a point
+        """
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.5
+
+    @property
+    def elo(self) -> float:
+        """
+        :return: The estimated Elo difference between this engine and the average engine it played against
+        """
+        return elo_difference(self.score)
+
+    @property
+    def latency(self) -> float:
+        """
+        :return: The average number of seconds per move
+        """
+        return self.think_time / self.moves if self.moves else 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.search_time if self.search_time else 0.0
+
+
+def elo_difference(score: float) -> float:
+    """
+    :param score:   The fraction of points won against an opponent
+    :return: The Elo rating difference that predicts :score: (Infinite if all or none of the points were won)
+    """
+    if score <= 0:
+        return -inf
+    if score >= 1:
+        return inf
+    return -400 * log10(1 / score - 1)
+
+
+def play_game(first: EngineConfig, second: EngineConfig, opening: Sequence[int] = (),
+              rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH) -> GameResult:
+    """
+    Plays a single game without a display
+    :param first:   The engine that makes the first move
+    :param second:  The engine that makes the second move
+    :param opening: Moves that are played before the engines take over
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :param length:  The number of tokens in a row needed to win
+    :return: The game's result
+    """
+    players = Player(1, 'red', False), Player(2, 'yellow', False)
+    engines = first, second
+    game = Game(rows, cols, players, length)
+    engine_moves, think_times, nodes, search_times = [0, 0], [0.0, 0.0], [0, 0], [0.0, 0.0]
+    moves = []
+    winner = None
+    while not game.is_full():
+        index = len(moves) % 2
+        if len(moves) < len(opening):
+            column = opening[len(moves)]
+        else:
+            start = perf_counter()
+            column = engines[index].choose(game)
+            elapsed = perf_counter() - start
+            engine_moves[index] += 1
+            think_times[index] += elapsed
+            if game.last_stats is not None:
+                nodes[index] += game.last_stats.nodes
+                search_times[index] += elapsed
+        game.insert(column, players[index].color)
+        moves.append(column)
+        if game.get_winning_player() is not None:
+            winner = index
+            break
+    return GameResult((first.name, second.name), winner, moves, engine_moves, think_times, nodes, search_times)
+
+
+def random_opening(rng: random.Random, plies: int, cols: int = COLS) -> List[int]:
+    """
+    :param rng:     The random number generator to use
+    :param plies:   The number of moves in the opening
+    :param cols:    The number of columns in the board
+    :return: A random sequence of moves (No column is picked more than twice, so short openings never fill a column)
+    """
+    moves: List[int] = []
+    while len(moves) < plies:
+        column = rng.randrange(cols)
+        if moves.count(column) < 2:
+            moves.append(column)
+    return moves
+
+
+def run_match(engines: Sequence[EngineConfig], games: int, workers: int = None, opening_plies: int = 2,
+              seed: int = None, rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH) -> Dict[str, Standing]:
+    """
+    Plays a round robin between :engines: in the shared process pool.
+    Every pair of engines plays each random opening twice, once with each engine moving first.
+    :param engines:         The engines to compare
+    :param games:           The number of games each pair of engines plays (Rounded up to an even number)
+    :param workers:         The number of worker processes, defaults to the number of CPUs
+    :param opening_plies:   The number of random moves played at the start of every game
+    :param seed:            The seed used to generate the openings
+    :param rows:            The number of rows in the board
+    :param cols:            The number of columns in the board
+    :param length:          The number of tokens in a row needed to win
+    :return: The standing of each engine, by name
+    """
+    rng = random.Random(seed)
+    pool = get_pool(workers)
+    futures = []
+    for a, b in combinations(engines, 2):
+        for _ in range((games + 1) // 2):
+            opening = random_opening(rng, opening_plies, cols)
+            futures.append(pool.submit(play_game, a, b, opening, rows, cols, length))
+            futures.append(pool.submit(play_game, b, a, opening, rows, cols, length))
+    standings = {engine.name: Standing(engine.name) for engine in engines}
+    for future in futures:
+        result = future.result()
+        for index, name in enumerate(result.engines):
+            standing = standings[name]
+            if result.winner is None:
+                standing.draws += 1
+            elif result.winner == index:
+                standing.wins += 1
+            else:
+                standing.losses += 1
+            standing.moves += result.engine_moves[index]
+            standing.think_time += result.think_times[index]
+            standing.nodes += result.nodes[index]
+            standing.search_time += result.search_times[index]
+    return standings
+
+
+def format_report(standings: Dict[str, Standing]) -> str:
+    """
+    :param standings:   The results of run_match()
+    :return: A table of every engine's results, sorted by score
+    """
+    lines = [f'{"Engine":<16}{"Games":>7}{"W":>6}{"D":>6}{"L":>6}{"Score":>8}{"Elo":>8}{"ms/move":>10}{"nodes/s":>10}']
+    for standing in sorted(standings.values(), key=lambda s: s.score, reverse=True):
+        lines.append(f'{standing.name:<16}{standing.games:>7}{standing.wins:>6}{standing.draws:>6}'
+                     f'{standing.losses:>6}{standing.score:>8.3f}{standing.elo:>+8.0f}'
+                     f'{1000 * standing.latency:>10.1f}{standing.nodes_per_second:>10.0f}')
+    return '\n'.join(lines)
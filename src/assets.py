@@ -0,0 +1,118 @@
+"""
+Module assets.py
+================
+
+This module contains the implementation of the AssetCache and AssetGroup classes, which load the game's images
+lazily and cache every scaled image both in memory and on disk
+"""
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Tuple
+
+import pygame
+
+from src.constants import ASSETS_PATH, Resolution, cache_path
+
+__all__ = ['AssetCache', 'AssetGroup', 'default_cache']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+PIXEL_FORMAT: str = 'RGBA'
+_to_bytes = getattr(pygame.image, 'tobytes', None) or pygame.image.tostring  # tobytes() was added in pygame 2.1.3
+_from_bytes = getattr(pygame.image, 'frombytes', None) or pygame.image.fromstring
+
+
+class AssetCache:
+    """
+    class AssetCache:
+    -----------------
+
+    Scaled images keyed by (asset path, resolution).
+    Images are kept in memory for the rest of the program and are saved to :directory: as raw pixel buffers, so the
+    next time the program starts the PNG doesn't have to be decoded and scaled again (A buffer is ignored if its
+    asset was modified after it was saved).
+    """
+
+    def __init__(self, directory: Path = cache_path):
+        self.__directory: Path = directory
+        self.__images: Dict[Tuple[Path, Resolution], pygame.Surface] = {}
+
+    def __len__(self) -> int:
+        return len(self.__images)
+
+    def __buffer_path(self, path: Path, res: Resolution) -> Path:
+        return self.__directory / f'{path.stem}_{res[0]}x{res[1]}.raw'
+
+    def get(self, path: Path, res: Resolution) -> pygame.Surface:
+        """
+        :param path:    The path of an image in ASSETS_PATH
+        :param res:     The desired resolution
+        :return: A surface object representing :path: scaled to :res:
+        """
+        key = path, tuple(res)
+        image = self.__images.get(key)
+        if image is None:
+            image = self.__images[key] = self.__load(path, key[1])
+        return image
+
+    def __load(self, path: Path, res: Resolution) -> pygame.Surface:
+        """
+        :param path:    The path of an image in ASSETS_PATH
+        :param res:     The desired resolution
+        :return: :path: scaled to :res:, read from the disk cache if possible
+        """
+        buffer_path = self.__buffer_path(path, res)
+        try:
+            if buffer_path.stat().st_mtime >= path.stat().st_mtime:
+                image = _from_bytes(buffer_path.read_bytes(), res, PIXEL_FORMAT).convert_alpha()
+                logging.debug(f'Loaded {path} ({res[0]}x{res[1]}) from {buffer_path}.')
+                return image
+        except (OSError, ValueError):  # Missing, unreadable or truncated buffer
+            pass
+        image = pygame.transform.scale(pygame.image.load(str(path)).convert_alpha(), res)
+        logging.debug(f'Loaded {path} ({res[0]}x{res[1]}).')
+        try:
+            self.__directory.mkdir(parents=True, exist_ok=True)
+            buffer_path.write_bytes(_to_bytes(image, PIXEL_FORMAT))
+        except OSError:
+            logging.warning(f'Could not cache {path} in {buffer_path}.')
+        return image
+
+    def clear(self) -> None:
+        """
+        Forgets the images that were loaded (The disk cache is kept)
+        :return: None
+        """
+        self.__images.clear()
+
+
+default_cache: AssetCache = AssetCache()
+
+
+class AssetGroup(Mapping):
+    """
+    class AssetGroup:
+    -----------------
+
+    The images that share a prefix in ASSETS_PATH (e.g. token_red.png and token_yellow.png), by suffix.
+    An image is only loaded the first time it's used, changing the group's resolution doesn't load anything.
+    """
+
+    def __init__(self, prefix: str, res: Resolution, cache: AssetCache = default_cache):
+        self.prefix: str = prefix
+        self.resolution: Resolution = res
+        self.__cache: AssetCache = cache
+        self.__paths: Dict[str, Path] = {path.stem.split('_', 1)[1]: path
+                                         for path in sorted(ASSETS_PATH.glob(f'{prefix}_*.png'))}
+
+    def __getitem__(self, suffix: str) -> pygame.Surface:
+        return self.__cache.get(self.__paths[suffix], self.resolution)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__paths)
+
+    def __len__(self) -> int:
+        return len(self.__paths)
+
+    def __repr__(self) -> str:
+        return f'AssetGroup({self.prefix!r}, {self.resolution!r}, {list(self.__paths)!r})'
@@ -0,0 +1,174 @@
+"""
+Module background.py
+====================
+
+This module contains the implementation of the BackgroundAI class, which runs the computer's searches in worker
+processes so that the game window keeps responding while the computer is thinking
+"""
+import asyncio
+from concurrent.futures import Future
+from typing import Any, Dict, Sequence, Tuple, Union
+
+from src.ai import SearchContext, order_moves
+from src.bitboard import BitBoard
+from src.game import Game
+from src.mcts import mcts_position
+from src.parallel import get_pool, search_position
+from src.stats import SearchStats
+
+__all__ = ['BackgroundAI']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+PositionId = Tuple[int, int, int, int]  # A position's geometry and key
+
+
+def _position_id(board: BitBoard) -> PositionId:
+    """
+    :param board:   A position
+    :return: An id that tells apart positions of every geometry (BitBoard.key() doesn't include the win length)
+    """
+    return board.rows, board.cols, board.length, board.key()
+
+
+class BackgroundAI:
+    """
+    class BackgroundAI:
+    -------------------
+
+    Runs the computer's searches in the shared process pool:
+    * think() starts searching the current position and poll() returns the chosen column once it's ready
+    * ponder() searches the positions after each of the opponent's possible replies while they are deciding,
+      so the answer to the move that was actually made is usually ready (or close to ready) when think() is called
+    """
+
+    def __init__(self, depth: str = None, time_budget: float = None, workers: int = None):
+        """
+        :param depth:       A key for Game.difficulty used to get the maximum search depth
+        :param time_budget: The number of seconds each search may take
+        :param workers:     The number of worker processes, defaults to the number of CPUs
+        """
+        self.__difficulty: str = depth if depth in Game.difficulty else 'medium'
+        self.__depth: int = Game.difficulty[self.__difficulty]
+        self.__time_budget: float = time_budget
+        self.__workers: int = workers
+        self.__search: Union[Future, None] = None
+        self.__pondering: Dict[PositionId, Future] = {}  # Position -> Search of that position
+        self.last_stats: Union[SearchStats, None] = None  # The statistics of the last search, None after a book move
+
+    @property
+    def depth(self) -> int:
+        """
+        :return: The maximum search depth (in plies)
+        """
+        return self.__depth
+
+    @property
+    def playouts(self) -> int:
+        """
+        :return: The number of playouts of each search made for an 'mcts' player
+        """
+        return Game.playouts[self.__difficulty]
+
+    def limit(self, engine: str) -> int:
+        """
+        :param engine:  The engine of a player (See Player.engine)
+        :return: The search depth (The number of playouts for the 'mcts' engine) of the player's searches
+        """
+        return self.playouts if engine == 'mcts' else self.__depth
+
+    @property
+    def time_budget(self) -> Union[float, None]:
+        return self.__time_budget
+
+    @property
+    def is_thinking(self) -> bool:
+        return self.__search is not None
+
+    @property
+    def is_pondering(self) -> bool:
+        return bool(self.__pondering)
+
+    def __submit(self, board: BitBoard, engine: str) -> Future:
+        """
+        :param board:   The position to search
+        :param engine:  The engine of the player to move in :board: (See Player.engine)
+        :return: The search's future, its result is the score, the best column and the statistics of the search
+        """
+        pool = get_pool(self.__workers)
+        if engine == 'mcts':
+            return pool.submit(mcts_position, board, self.playouts, self.__time_budget)
+        return pool.submit(search_position, board, self.__depth, self.__time_budget, Game.table_size_mb)
+
+    def think(self, board: Game) -> None:
+        """
+        Starts searching for the best move in :board:, reusing the pondering search of the position if there is
+        one, or the opening book's move
+        :param board:   The game board
+        :return: None
+        """
+        position = board.convert()
+        self.__search = self.__pondering.pop(_position_id(position), None)
+        self.stop_pondering()
+        book_move = board.book_move()
+        if book_move != -1:
+            self.__search = Future()
+            self.__search.set_result((0, book_move, None))
+        elif self.__search is None or self.__search.cancelled():
+            self.__search = self.__submit(position, board.get_current_player().engine)
+
+    def poll(self) -> int:
+        """
+        :return: The column chosen by the current search if it has finished, -1 otherwise
+        """
+        if self.__search is None or not self.__search.done():
+            return -1
+        column = self.__finish(self.__search.result())
+        self.__search = None
+        return column
+
+    async def choose(self, board: Game) -> int:
+        """
+        Searches :board: like think() and waits for the result without blocking the event loop
+        :param board:   The game board
+        :return: The chosen column
+        """
+        self.think(board)
+        try:
+            return self.__finish(await asyncio.wrap_future(self.__search))
+        finally:
+            self.__search = None
+
+    def __finish(self, result: Sequence[Any]) -> int:
+        """
+        :param result:  The result of a search (See search_position() and mcts_position())
+        :return: The chosen column
+        """
+        self.last_stats = result[2]
+        if self.last_stats is not None and Game.log_stats:
+            self.last_stats.log('background')
+        return result[1]
+
+    def ponder(self, board: Game) -> None:
+        """
+        Starts searching the positions that follow each of the replies available to the player to move in :board:,
+        the most likely replies are searched first
+        :param board:   The game board, on the opponent's turn
+        :return: None
+        """
+        self.stop_pondering()
+        position = board.convert()
+        engine = board.players[1 - position.player].engine
+        for column in order_moves(position, position.legal_moves(), SearchContext()):
+            reply = position.copy()
+            reply.play(column)
+            self.__pondering[_position_id(reply)] = self.__submit(reply, engine)
+
+    def stop_pondering(self) -> None:
+        """
+        Cancels every pondering search that hasn't started yet
+        :return: None
+        """
+        for future in self.__pondering.values():
+            future.cancel()
+        self.__pondering.clear()
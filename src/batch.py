@@ -0,0 +1,118 @@
+"""
+Module batch.py
+===============
+
+This module contains NumPy versions of has_won() and evaluate() that work on many positions at once
+"""
+from typing import Sequence
+
+import numpy as np
+
+from src.bitboard import BitBoard
+from src.constants import MAX_HEURISTIC, MAX_SCORE, WIN_LENGTH, PatternTable
+from src.evaluation import pattern_table
+
+__all__ = ['to_grids', 'has_won_batch', 'evaluate_batch']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+# Each direction is (row step, column step), rows are counted from the bottom of the board
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (-1, 1))
+
+
+def to_grids(boards: Sequence[BitBoard]) -> np.ndarray:
+    """
+    :param boards:  Positions of the same size
+    :return: An (N, rows, cols) int8 array where 0 is an empty cell, 1 is the first player's token and 2 is the
+             second player's token (Row 0 is the bottom row)
+    """
+    rows, cols = (boards[0].rows, boards[0].cols) if len(boards) else (0, 0)
+    height = rows + 1
+    if height * cols > 64:  # The masks don't fit in a uint64, decode them one board at a time
+        return np.array([[[board.cell(row, column) + 1 for column in range(cols)] for row in range(rows)]
+                         for board in boards], dtype=np.int8).reshape(len(boards), rows, cols)
+    masks = np.array([board.masks for board in boards], dtype=np.uint64).reshape(len(boards), 2)
+    bits = (masks[:, :, None] >> np.arange(height * cols, dtype=np.uint64)) & np.uint64(1)
+    bits = bits.reshape(len(boards), 2, cols, height)[..., :rows].transpose(0, 1, 3, 2).astype(np.int8)
+    return bits[:, 0] + 2 * bits[:, 1]
+
+
+def _window_counts(pieces: np.ndarray, length: int) -> np.ndarray:
+    """
+    :param pieces:  An (N, rows, cols) array of 0s and 1s
+    :param length:  The number of cells in a window
+    :return: An (N, windows) array of the number of pieces in every window of every board
+    """
+    n, rows, cols = pieces.shape
+    counts = []
+    for d_row, d_column in DIRECTIONS:
+        row_start, row_end = max(0, -d_row * (length - 1)), rows - max(0, d_row * (length - 1))
+        column_end = cols - d_column * (length - 1)
+        if row_end <= row_start or column_end <= 0:
+            continue
+        total = sum(pieces[:, row_start + i * d_row:row_end + i * d_row, i * d_column:column_end + i * d_column]
+                    for i in range(length))
+        counts.append(total.reshape(n, -1))
+    return np.concatenate(counts, axis=1) if counts else np.zeros((n, 0), dtype=np.int8)
+
+
+def has_won_batch(boards: np.ndarray, player: int = None, length: int = WIN_LENGTH) -> np.ndarray:
+    """
+    :param boards:  An (N, rows, cols) array of positions (See to_grids())
+    :param player:  The index of the player to check, defaults to the player who made the last move in each board
+    :param length:  The number of tokens in a row needed to win
+    :return: An (N,) bool array, True where :player: has :length: tokens in a row
+    """
+    wins = np.stack([(_window_counts((boards == index + 1).astype(np.int8), length) == length).any(axis=1)
+                     for index in range(2)], axis=1)
+    if player is not None:
+        return wins[:, player]
+    last_player = 1 - _players_to_move(boards)
+    return wins[np.arange(len(boards)), last_player]
+
+
+def _players_to_move(boards: np.ndarray) -> np.ndarray:
+    """
+    :param boards:  An (N, rows, cols) array of positions
+    :return: An (N,) array of the index of the player to move in each board
+    """
+    return np.count_nonzero(boards.reshape(len(boards), -1), axis=1) & 1
+
+
+def _window_patterns(boards: np.ndarray, length: int) -> np.ndarray:
+    """
+    :param boards:  An (N, rows, cols) array of positions (See to_grids())
+    :param length:  The number of cells in a window
+    :return: An (N, windows) array of the pattern index (See evaluation.py) of every window of every board
+    """
+    n, rows, cols = boards.shape
+    patterns = []
+    for d_row, d_column in DIRECTIONS:  # Cells are in the same order along each line as evaluation.window_patterns()
+        row_start, row_end = max(0, -d_row * (length - 1)), rows - max(0, d_row * (length - 1))
+        column_end = cols - d_column * (length - 1)
+        if row_end <= row_start or column_end <= 0:
+            continue
+        index = sum(boards[:, row_start + i * d_row:row_end + i * d_row, i * d_column:column_end + i * d_column]
+                    .astype(np.int64) * 3 ** i for i in range(length))
+        patterns.append(index.reshape(n, -1))
+    return np.concatenate(patterns, axis=1) if patterns else np.zeros((n, 0), dtype=np.int64)
+
+
+def evaluate_batch(boards: np.ndarray, length: int = WIN_LENGTH, table: PatternTable = None) -> np.ndarray:
+    """
+    The same heuristic as evaluate(), for many positions at once
+    :param boards:  An (N, rows, cols) array of positions (See to_grids())
+    :param length:  The number of tokens in a row needed to win
+    :param table:   The pattern table the windows are scored with, defaults to pattern_table()
+    :return: An (N,) int64 array of the score of each board, from the perspective of the player to move
+    """
+    table = np.asarray(pattern_table(length) if table is None else table, dtype=np.int64)
+    score = table[_window_patterns(boards, length)].sum(axis=1)  # From the first player's perspective
+    score = np.clip(score, -MAX_HEURISTIC, MAX_HEURISTIC)
+    wins = [(_window_counts((boards == index + 1).astype(np.int8), length) == length).any(axis=1)
+            for index in range(2)]
+    to_move = _players_to_move(boards)
+    score = np.where(to_move == 0, score, -score)
+    side_won = np.where(to_move == 0, wins[0], wins[1])
+    other_won = np.where(to_move == 0, wins[1], wins[0])
+    return np.where(other_won, -MAX_SCORE, np.where(side_won, MAX_SCORE, score))
@@ -0,0 +1,333 @@
+"""
+Module bitboard.py
+==================
+
+This module contains the implementation of the BitBoard class, the compact game state used by the AI
+"""
+from functools import lru_cache
+from typing import Any, List, Tuple
+
+from src.constants import COLS, ROWS, WIN_LENGTH
+
+__all__ = ['BitBoard', 'board_masks', 'cell_lines', 'cell_windows', 'column_masks', 'window_masks']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+@lru_cache()
+def window_masks(rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH) -> Tuple[int, ...]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :param length:  The number of tokens in a row needed to win
+    :return: A mask of every line of :length: cells that a player could win with (Using BitBoard's cell numbering)
+    """
+    height, masks = rows + 1, []
+    for column in range(cols):
+        for row in range(rows):
+            for d_column, d_row in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_column, end_row = column + d_column * (length - 1), row + d_row * (length - 1)
+                if end_column < cols and 0 <= end_row < rows:
+                    masks.append(sum(1 << ((column + i * d_column) * height + row + i * d_row)
+                                     for i in range(length)))
+    return tuple(masks)
+
+
+@lru_cache()
+def board_masks(rows: int = ROWS, cols: int = COLS) -> Tuple[int, int]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :return: A mask of the lowest cell of every column and a mask of every cell in the board (Without the sentinels)
+    """
+    bottom = sum(1 << (column * (rows + 1)) for column in range(cols))
+    return bottom, bottom * ((1 << rows) - 1)
+
+
+@lru_cache()
+def column_masks(rows: int = ROWS, cols: int = COLS) -> Tuple[int, ...]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :return: A mask of the cells of each column (Without the sentinel)
+    """
+    return tuple(((1 << rows) - 1) << (column * (rows + 1)) for column in range(cols))
+
+
+@lru_cache()
+def cell_windows(rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH) -> Tuple[Tuple[int, ...], ...]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :param length:  The number of tokens in a row needed to win
+    :return: The indexes (In window_masks()) of the windows that contain each cell, by bit index
+    """
+    cells: List[List[int]] = [[] for _ in range((rows + 1) * cols)]
+    for index, window in enumerate(window_masks(rows, cols, length)):
+        while window:
+            bit = window & -window
+            cells[bit.bit_length() - 1].append(index)
+            window ^= bit
+    return tuple(tuple(windows) for windows in cells)
+
+
+@lru_cache()
+def cell_lines(rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH) -> Tuple[Tuple[int, ...], ...]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :param length:  The number of tokens in a row needed to win
+    :return: The masks of the windows that contain each cell, by bit index (The only lines a move there can complete)
+    """
+    windows = window_masks(rows, cols, length)
+    return tuple(tuple(windows[index] for index in indexes) for indexes in cell_windows(rows, cols, length))
+
+
+class BitBoard:
+    """
+    class BitBoard:
+    ---------------
+
+    A position stored as one integer mask per player and a height table per column.
+    Cells are numbered column by column, bottom to top, with an extra (always empty) sentinel bit on top of
+    every column so that shifted masks never wrap around into the next column:
+
+        .  .  .  .  .  .  .     <- sentinel row
+        5 12 19 26 33 40 47
+        4 11 18 25 32 39 46
+        3 10 17 24 31 38 45
+        2  9 16 23 30 37 44
+        1  8 15 22 29 36 43
+        0  7 14 21 28 35 42
+
+    Player 0 always makes the first move, so the player to move is the parity of the number of moves played.
+    Masks are Python integers, so boards of any size work (Boards with more than 64 bits are just slower).
+    The bits of the moves that were played are kept so that a win can be checked using only the lines through the
+    last move (See wins_at()).
+    An evaluation state (See evaluation.EvalState) can be attached to a board, it's updated on every move.
+    """
+    __slots__ = ('rows', 'cols', 'length', 'masks', 'heights', 'moves', 'played', 'evaluation')
+
+    def __init__(self, rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH):
+        self.rows: int = rows
+        self.cols: int = cols
+        self.length: int = length  # The number of tokens in a row needed to win
+        self.masks: List[int] = [0, 0]
+        self.heights: List[int] = [column * (rows + 1) for column in range(cols)]  # Index of the next free bit
+        self.moves: int = 0
+        self.played: List[int] = []  # The bit index of every move, in order
+        self.evaluation: Any = None
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, BitBoard) and self.masks == other.masks and self.cols == other.cols and \
+            self.length == other.length
+
+    def __hash__(self) -> int:
+        return self.key()
+
+    def __repr__(self) -> str:
+        return f'BitBoard({self.rows}, {self.cols}, {self.length}, masks={self.masks!r})'
+
+    def __str__(self) -> str:
+        return '\n'.join(''.join('.xo'[self.cell(row, column) + 1] for column in range(self.cols))
+                         for row in reversed(range(self.rows)))
+
+    def copy(self) -> 'BitBoard':
+        """
+        :return: A shallow copy of this position
+        """
+        other = BitBoard.__new__(BitBoard)
+        other.rows, other.cols, other.length, other.moves = self.rows, self.cols, self.length, self.moves
+        other.masks = self.masks[:]
+        other.heights = self.heights[:]
+        other.played = self.played[:]
+        other.evaluation = None if self.evaluation is None else self.evaluation.copy()
+        return other
+
+    def mirror(self) -> 'BitBoard':
+        """
+        :return: A copy of this position flipped horizontally
+        """
+        other = self.copy()
+        other.evaluation = None
+        column_mask = (1 << self.height) - 1
+        for player in range(2):
+            other.masks[player] = 0
+            for column in range(self.cols):
+                bits = (self.masks[player] >> (column * self.height)) & column_mask
+                other.masks[player] |= bits << ((self.cols - 1 - column) * self.height)
+        for column in range(self.cols):
+            mirrored = self.cols - 1 - column
+            other.heights[mirrored] = self.heights[column] + (mirrored - column) * self.height
+        other.played = [(self.cols - 1 - bit // self.height) * self.height + bit % self.height for bit in self.played]
+        return other
+
+    @property
+    def height(self) -> int:
+        """
+        :return: The number of bits used by each column, including the sentinel
+        """
+        return self.rows + 1
+
+    @property
+    def mask(self) -> int:
+        """
+        :return: A mask of every occupied cell
+        """
+        return self.masks[0] | self.masks[1]
+
+    @property
+    def player(self) -> int:
+        """
+        :return: The index (0 or 1) of the player whose turn it is
+        """
+        return self.moves & 1
+
+    def key(self) -> int:
+        """
+        :return: A number that uniquely identifies this position among positions of the same geometry (The first
+                 player's mask plus a marker bit above the top token of each column). The win length isn't part of
+                 it, so tables that outlive a game are cleared when the geometry changes
+        """
+        return self.masks[0] + self.mask + self.bottom_mask()
+
+    def bottom_mask(self) -> int:
+        """
+        :return: A mask with the lowest cell of every column set
+        """
+        return board_masks(self.rows, self.cols)[0]
+
+    def possible(self) -> int:
+        """
+        :return: A mask of the cells that can be played next (The lowest empty cell of every column that isn't full)
+        """
+        bottom, full = board_masks(self.rows, self.cols)
+        return (self.mask + bottom) & full
+
+    def winning_cells(self, player: int, length: int = None) -> int:
+        """
+        :param player:  The index of a player
+        :param length:  The number of tokens in a row needed to win, defaults to the board's
+        :return: A mask of the empty cells (Playable or not) that would give :player: :length: tokens in a row
+        """
+        if length is None:
+            length = self.length
+        mine, cells = self.masks[player], 0
+        if length == 4:  # The usual case, unrolled
+            cells = (mine << 1) & (mine << 2) & (mine << 3)  # Only the cell above a vertical line can be empty
+            for shift in (self.height - 1, self.height, self.height + 1):  # \, -, /
+                pair = (mine << shift) & (mine << 2 * shift)
+                cells |= pair & ((mine << 3 * shift) | (mine >> shift))
+                pair = (mine >> shift) & (mine >> 2 * shift)
+                cells |= pair & ((mine >> 3 * shift) | (mine << shift))
+            return cells & board_masks(self.rows, self.cols)[1] & ~self.mask
+        for shift in (1, self.height - 1, self.height, self.height + 1):  # |, \, -, /
+            # after[i] (before[i]) is a mask of the cells followed (preceded) by i of the player's tokens in a row
+            after, before = [-1], [-1]
+            for i in range(1, length):
+                after.append(after[-1] & (mine >> (i * shift)))
+                before.append(before[-1] & (mine << (i * shift)))
+            for gap in range(length):  # The number of tokens before the cell in the line
+                cells |= after[length - 1 - gap] & before[gap]
+        return cells & board_masks(self.rows, self.cols)[1] & ~self.mask
+
+    def non_losing_moves(self) -> int:
+        """
+        Assumes that the player to move can't win on this move (See winning_cells())
+        :return: A mask of the playable cells that don't let the opponent win on their next move: if the opponent has
+                 a playable winning cell it's the only candidate (None if they have two), and cells right below one of
+                 the opponent's winning cells are never candidates
+        """
+        possible = self.possible()
+        threats = self.winning_cells(1 - self.player)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):  # Two threats can't both be blocked
+                return 0
+            possible = forced
+        return possible & ~(threats >> 1)
+
+    def cell(self, row: int, column: int) -> int:
+        """
+        :param row:     The index of the row, 0 being the bottom row
+        :param column:  The index of the column
+        :return: The index of the player that owns the cell, -1 if it is empty
+        """
+        bit = 1 << (column * self.height + row)
+        return 0 if self.masks[0] & bit else 1 if self.masks[1] & bit else -1
+
+    def can_play(self, column: int) -> bool:
+        """
+        :param column:  The index of a column
+        :return: True if the column has an empty cell, False otherwise
+        """
+        return self.heights[column] < column * self.height + self.rows
+
+    def legal_moves(self) -> List[int]:
+        """
+        :return: The indexes of all of the columns that aren't full
+        """
+        return [column for column in range(self.cols) if self.can_play(column)]
+
+    def is_full(self) -> bool:
+        """
+        :return: True if there are no empty cells left, False otherwise
+        """
+        return self.moves >= self.rows * self.cols
+
+    def play(self, column: int) -> None:
+        """
+        Drops a token of the player to move into :column:, the column must not be full
+        :param column:  The index of the column
+        :return: None
+        """
+        bit = self.heights[column]
+        self.masks[self.moves & 1] |= 1 << bit
+        self.played.append(bit)
+        if self.evaluation is not None:
+            self.evaluation.play(bit, self.moves & 1)
+        self.heights[column] += 1
+        self.moves += 1
+
+    def unplay(self, column: int) -> None:
+        """
+        Removes the top token of :column:, which has to be the last move that was played
+        :param column:  The index of the column
+        :return: None
+        """
+        self.moves -= 1
+        self.heights[column] -= 1
+        self.masks[self.moves & 1] ^= 1 << self.heights[column]
+        self.played.pop()
+        if self.evaluation is not None:
+            self.evaluation.unplay(self.heights[column], self.moves & 1)
+
+    def wins_at(self, bit: int, player: int) -> bool:
+        """
+        :param bit:     The bit index of a cell
+        :param player:  The index of a player
+        :return: True if :player: has a line of tokens through the cell, False otherwise
+        """
+        mine = self.masks[player]
+        for line in cell_lines(self.rows, self.cols, self.length)[bit]:
+            if mine & line == line:
+                return True
+        return False
+
+    def connected(self, mask: int, length: int = None) -> bool:
+        """
+        :param mask:    A mask of a single player's tokens
+        :param length:  The number of tokens that have to be in a row, defaults to the board's
+        :return: True if :mask: contains :length: tokens in a row in any direction, False otherwise
+        """
+        if length is None:
+            length = self.length
+        for shift in (1, self.height - 1, self.height, self.height + 1):  # |, \, -, /
+            m = mask
+            for i in range(1, length):
+                m &= mask >> (i * shift)
+                if not m:
+                    break
+            if m:
+                return True
+        return False
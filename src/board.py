@@ -2,200 +2,132 @@
 Module board.py
 ===============
 
-This module contains the implementation of the Board and Token classes
+This module contains the implementation of the Board class, the graphical version of a Game
 """
-import copy
-from math import inf
-from typing import Any, Iterable, Set, Union
+from typing import Iterator, List, Tuple, Union
 
+import pygame
 from pygame.locals import MOUSEBUTTONUP
 
-from src.ai import has_won, alpha_beta
-from src.constants import *
+from src.constants import FPS, WIN_LENGTH, Colors, ImageDict, Position, ResDict, Resolution
+from src.game import Game, Token
 from src.player import Player
+from src.scheduler import FrameScheduler
 
 __all__ = ['Board', 'Token']
 __version__ = '0.1'
 __author__ = 'Eric G.D'
 
 
-class Token:
+class Board(Game):
+    """
+    class Board:
+    ------------
 
-    def __init__(self, color: str = None, outline: str = 'normal'):
-        self.color: str = color
-        self.outline: str = outline
-
-    def __bool__(self) -> bool:
-        return bool(self.__color)
-
-    def __eq__(self, other: Any) -> bool:
-        return isinstance(other, Token) and other.color == self.color and other.__outline == self.__outline
-
-    def __str__(self) -> str:
-        return self.color[0].title()
-
-    def __repr__(self) -> str:
-        return f'Token({self.__color!r}, {self.__outline!r})'
-
-    @property
-    def color(self) -> str:
-        return self.__color
-
-    @color.setter
-    def color(self, color: str):
-        if color is not None and color not in Board.images['token'].keys():
-            raise ValueError(f"'{color}' is not a valid token color!")
-        self.__color = color
-
-    @property
-    def outline(self) -> str:
-        return self.__outline
-
-    @outline.setter
-    def outline(self, outline: str) -> None:
-        if outline is not None and outline not in Board.images['board'].keys():
-            raise ValueError(f"'{outline}' is not a valid token outline!")
-        self.__outline = outline
-
-
-class Board:
+    A Game that is drawn onto a pygame surface
+    """
     clock: 'pygame.time.Clock' = None
     images: ImageDict = {}
-    old_rects: List[pygame.Rect] = []
     resolutions: ResDict = {}
 
-    difficulty: Dict[str, int] = {
-        'very easy': 1,
-        'easy': 2,
-        'medium': 3,
-        'hard': 5,
-        'expert': 7
-    }
-
-    def __init__(self, rows: int, cols: int, players: Tuple[Player, Player]):
-        self.__rows: int = rows
-        self.__cols: int = cols
-        self.__turn_num: int = 0
+    def __init__(self, rows: int, cols: int, players: Tuple[Player, Player], length: int = WIN_LENGTH):
+        super().__init__(rows, cols, players, length)
         self.__extra_token_pos: Position = (0, 0)
         self.__center_extra_token: bool = False
-        self.__board: List[List[Token]] = [[Token() for _ in range(cols)] for _ in range(rows)]
-        self.__prev_boards: List[List[List[Token]]] = []  # Will be used to store move history
-        self.__players: Tuple[Player, Player] = players
-        self.__available_moves: Set[int] = set(range(cols))
-
-    def __len__(self) -> int:
-        return len(self.__board)
-
-    def __iter__(self) -> Iterable[List[Token]]:
-        return iter(self.__board)
-
-    def convert(self) -> GameState:
-        """
-        :return: A simplified version of this object for use in the negamax algorithm
-        """
-        return [[token.color for token in row] for row in self.__board]
-
-    def negamax(self, depth: str = None) -> int:
-        """
-        :param depth:   A key for Board.difficulty used to get the maximum search depth
-        :return: The best column to pick for the next turn
-        """
-        board = self.convert()
-        move_set = copy.deepcopy(self.__available_moves)
-        depth = Board.difficulty.get(depth, Board.difficulty['medium'])
-        color = self.get_current_player().color
-        return alpha_beta(board, color, move_set, -inf, inf, depth)
-
-    def get_current_player(self) -> Player:
-        """
-        :return: The player who is currently playing
-        """
-        return self.__players[self.__turn_num % len(self.__players)]
-
-    def get_winning_player(self) -> Union[str, None]:
-        """
-        :return: The color of the player who has won, None otherwise
-        """
-        return self.get_current_player().color if has_won(self.convert()) else None
-
-    def is_full(self) -> bool:
-        """
-        :return: True if there are no empty spaces in the board, False otherwise
-        """
-        # return self.__turn_num >= self.tile_num
-        return not self.__available_moves
-
-    def lowest_space(self, column: int) -> int:
-        """
-        :param column: The column to check
-        :return: The index of lowest empty slot in :column:
-        """
-        return next((i for i in range(self.rows) if not self.__board[i][column]), -1)
-
-    def column_full(self, column: int) -> bool:
-        """
-        :param column:  The index of a column
-        :return: True if the column is full, False otherwise
-        """
-        return self.__board[-1][column].color is not None
+        self.__cell_rects: List[pygame.Rect] = []  # Row by row from the bottom
+        self.__layer: Union[pygame.Surface, None] = None
+        self.__layer_key: Tuple[Resolution, ...] = ()
+        self.__old_rects: List[pygame.Rect] = []  # The extra token's rects in the last frame
 
     def insert(self, surface: pygame.Surface, column: int, color: str) -> None:
         """
-        Inserts a :color: token into :board:'s :column:th column
-        :param surface: The surface object to draw the new token on
+        Animates a :color: token falling into :board:'s :column:th column and inserts it
+        :param surface: The surface object to draw the new token on, None to insert it without animating it
         :param column:  The index of the column that the new token will be inserted into
         :param color:   The color of the new token
         :return: None
         """
-        if not 0 <= column < self.cols:
-            raise ValueError(f'Invalid column index, {column} is not between 0 and {self.cols}')
-        if column not in self.__available_moves:
-            raise ValueError(f'Cannot insert token into column {column} as it is full.')
-        row = self.lowest_space(column)
-        self.animate_token(surface, FPS, column, color)
-        self.__prev_boards.append(copy.deepcopy(self.__board))
-        self.__board[row][column] = Token(color)
-        self.__turn_num += 1
-        if row == self.rows - 1:
-            self.__available_moves.remove(column)
+        self.check_move(column)
+        if surface is not None:
+            self.animate_token(surface, FPS, column, color)
+        super().insert(column, color)
+
+    def __build_layer(self) -> None:
+        """
+        Precomputes the rect of every cell for the current resolutions and renders every cell onto a new board
+        layer (A copy of the whole window without the extra token)
+        :return: None
+        """
+        (x_margin, y_margin), (width, height) = Board.resolutions['margin'], Board.resolutions['token']
+        self.__cell_rects = [pygame.Rect(x_margin + column * width, y_margin + (self.rows - row - 1) * height,
+                                         width, height)
+                             for row in range(self.rows) for column in range(self.cols)]
+        self.__layer = pygame.Surface(Board.resolutions['window']).convert()
+        self.__layer.fill(Colors.background)
+        self.__layer_key = Board.resolutions['window'], Board.resolutions['margin'], Board.resolutions['token']
+        for row in range(self.rows):
+            for column in range(self.cols):
+                self.__render_cell(row, column)
+
+    def __render_cell(self, row: int, column: int) -> pygame.Rect:
+        """
+        Renders a single cell onto the board layer
+        :param row:     The index of the row, 0 being the bottom row
+        :param column:  The index of the column
+        :return: The rect of the cell
+        """
+        rect = self.__cell_rects[row * self.cols + column]
+        piece = self.cell(row, column)
+        self.__layer.fill(Colors.background, rect)
+        if piece:
+            self.__layer.blit(Board.images['token'][piece.color], rect)
+        self.__layer.blit(Board.images['board'][piece.outline], rect)
+        return rect
 
     def draw(self, surface: pygame.Surface, fps: int = 0, extra_token: str = None) -> None:
         """
-        Draws the board onto :surface: using the images from Board.images
+        Draws the board onto :surface: using the images from Board.images.
+        Only the cells that changed since the last frame are rendered again (Onto the board layer), and only they and
+        the extra token's old and new positions are copied to :surface: and updated on the screen.
         :param surface:     The surface to blit onto
         :param fps:         The game's maximum framerate
         :param extra_token: An additional token, drawn above the board on a human player's turn or
                             in the board while dropping a token
         :return: None
         """
-        surface.fill(Colors.background)
-        x_margin, y_margin = Board.resolutions['margin']
-        above_board_rect = pygame.Rect(x_margin, 0,
-                                       Board.resolutions['window'][0] - (2 * x_margin), y_margin)
-        rects = [above_board_rect]
+        dirty = self.take_dirty_cells()
+        if self.__layer is None or \
+                self.__layer_key != (Board.resolutions['window'], Board.resolutions['margin'],
+                                     Board.resolutions['token']):
+            self.__build_layer()
+            surface.blit(self.__layer, (0, 0))
+            rects = [surface.get_rect()]
+        else:
+            rects = [self.__render_cell(row, column) for row, column in dirty]
+            for rect in rects + self.__old_rects:  # Also erases the extra token from the last frame
+                surface.blit(self.__layer, rect, rect)
+            rects += self.__old_rects
+        extra_rects = []
         if extra_token:
             extra_rect = pygame.Rect(self.extra_token_pos, Board.resolutions['token'])
             if self.__center_extra_token:
                 extra_rect.center = self.extra_token_pos
-            surface.blit(Board.images['token'][extra_token], extra_rect)
-            # surface.fill(Colors.orange, extra_rect)  # Debug
-            rects.append(extra_rect)
-        for i in range(self.cols):
-            for j in range(self.rows):
-                pos = tuple(Board.resolutions['margin'][k] +
-                            ((i, j)[k] * Board.resolutions['token'][k]) for k in range(2))
-                current_space = pygame.Rect(pos, Board.resolutions['token'])
-                # TODO: Fixing :pos: typing error
-                indexes = -(j + 1), i
-                piece = self.__board[indexes[0]][indexes[1]]
+            overlapping = [divmod(i, self.cols) for i in extra_rect.collidelistall(self.__cell_rects)]
+            surface.set_clip(extra_rect)  # The extra token is drawn behind the board's outline
+            surface.fill(Colors.background)
+            for row, column in overlapping:
+                piece = self.cell(row, column)
                 if piece:
-                    surface.blit(Board.images['token'][piece.color], current_space)
-                surface.blit(Board.images['board'][piece.outline], current_space)
-                if not self.__prev_boards or piece != self.__prev_boards[-1][indexes[0]][indexes[1]]:
-                    rects.append(current_space)
-        pygame.display.update(rects + Board.old_rects)
+                    surface.blit(Board.images['token'][piece.color], self.__cell_rects[row * self.cols + column])
+            surface.blit(Board.images['token'][extra_token], extra_rect)
+            for row, column in overlapping:
+                surface.blit(Board.images['board'][self.cell(row, column).outline],
+                             self.__cell_rects[row * self.cols + column])
+            surface.set_clip(None)
+            extra_rects.append(extra_rect)
+        pygame.display.update(rects + extra_rects)
         Board.clock.tick(fps)
-        Board.old_rects[:] = rects
+        self.__old_rects = extra_rects
 
     def animate_token(self, surface: pygame.Surface, fps: int = FPS, column: int = 0, color: str = None) -> None:
         """
@@ -211,32 +143,43 @@ class Board:
         if color is None:
             color = self.get_current_player().color
         pygame.event.set_blocked(MOUSEBUTTONUP)
+        for x, y in self.__drop_path(column, fps):
+            pygame.event.pump()  # Let pygame handle events while animating
+            self.set_extra_token(x, y, is_centred=False)
+            self.draw(surface, fps, extra_token=color)
+        pygame.event.set_allowed(MOUSEBUTTONUP)
+
+    async def drop_token(self, column: int, scheduler: FrameScheduler) -> None:
+        """
+        Moves the extra token down :column: one frame at a time, without drawing it or blocking other tasks
+        (The token should be drawn by one of :scheduler:'s renderers)
+        :param column:      The column the token is being inserted into
+        :param scheduler:   The scheduler that renders the frames
+        :return: None
+        """
+        if not 0 <= column < self.cols:
+            raise ValueError(f'{column} is not a valid insertion index!')
+        for x, y in self.__drop_path(column, scheduler.fps):
+            self.set_extra_token(x, y, is_centred=False)
+            await scheduler.next_frame()
+
+    def __drop_path(self, column: int, fps: int) -> Iterator[Position]:
+        """
+        :param column:  The column the token is being inserted into
+        :param fps:     The framerate of the animation
+        :return: The top-left corner of a falling token in each frame, until it reaches the lowest empty cell
+        """
         row = self.lowest_space(column)
         x = Board.resolutions['margin'][0] + column * Board.resolutions['board'][0]  # The x coordinate of the token
         y = Board.resolutions['margin'][1] // 4
         acceleration = Board.resolutions['token'][1] / fps
         velocity = 0
         while True:
-            pygame.event.pump()  # Let pygame handle events while animating
             y += int(velocity)
             velocity += acceleration
             if y - Board.resolutions['margin'][1] >= (self.rows - row - 1) * Board.resolutions['token'][1]:
                 break
-            self.set_extra_token(x, y, is_centred=False)
-            self.draw(surface, fps, extra_token=color)
-        pygame.event.set_allowed(MOUSEBUTTONUP)
-
-    @property
-    def rows(self) -> int:
-        return self.__rows
-
-    @property
-    def cols(self) -> int:
-        return self.__cols
-
-    @property
-    def tile_num(self) -> int:
-        return self.__rows * self.__cols
+            yield x, y
 
     @property
     def extra_token_pos(self):
@@ -0,0 +1,134 @@
+"""
+Module book.py
+==============
+
+This module contains the implementation of the OpeningBook class, a file of precomputed best moves for the first
+plies of the game, and the function that builds it
+"""
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+from src.ai import has_won
+from src.bitboard import BitBoard
+from src.constants import COLS, ROWS, WIN_LENGTH
+from src.parallel import get_pool, search_position
+
+__all__ = ['OpeningBook', 'build_book', 'canonical']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+MAGIC: bytes = b'C4BK'
+FORMAT_VERSION: int = 2
+HEADER: struct.Struct = struct.Struct('<4sBBBBBI')  # Magic, version, rows, cols, length, plies, number of records
+RECORD: struct.Struct = struct.Struct('<Qbi')  # Canonical position key, best move, score
+
+
+def canonical(board: BitBoard) -> Tuple[int, bool]:
+    """
+    A position and its mirror image share a single book entry, stored under the smaller of their keys
+    :param board:   A position
+    :return: The key :board: is stored under, and True if it's the key of the mirrored position
+    """
+    key, mirrored_key = board.key(), board.mirror().key()
+    return (mirrored_key, True) if mirrored_key < key else (key, False)
+
+
+class OpeningBook:
+    """
+    class OpeningBook:
+    ------------------
+
+    A read-only view of a book file created by build_book().
+    The file is a header followed by fixed-size records sorted by key, it's memory-mapped and searched with
+    binary search, so it's never loaded into memory as a whole.
+    """
+
+    def __init__(self, path: Path):
+        self.__file = open(path, 'rb')
+        self.__data: mmap.mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.length, self.plies, self.__count = HEADER.unpack_from(self.__data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"'{path}' is not a version {FORMAT_VERSION} opening book!")
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __enter__(self) -> 'OpeningBook':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the book file
+        :return: None
+        """
+        self.__data.close()
+        self.__file.close()
+
+    def probe(self, board: BitBoard) -> Union[Tuple[int, int], None]:
+        """
+        :param board:   A position
+        :return: The best move and score stored for :board:, None if it's not in the book
+        """
+        if (board.rows, board.cols, board.length) != (self.rows, self.cols, self.length) or board.moves > self.plies:
+            return None
+        key, is_mirrored = canonical(board)
+        low, high = 0, self.__count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, move, score = RECORD.unpack_from(self.__data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return (self.cols - 1 - move if is_mirrored else move), score
+        return None
+
+
+def build_book(path: Path, plies: int, depth: int, time_budget: float = None, workers: int = None,
+               rows: int = ROWS, cols: int = COLS, length: int = WIN_LENGTH) -> int:
+    """
+    Searches every position reachable in up to :plies: moves (Ignoring mirror images and finished games) and
+    writes the results to an opening book file
+    :param path:        The path of the book file
+    :param plies:       The number of moves played in the deepest positions of the book
+    :param depth:       The maximum search depth for every position
+    :param time_budget: The number of seconds each position may be searched for, None to search exactly :depth:
+    :param workers:     The number of worker processes, defaults to the number of CPUs
+    :param rows:        The number of rows in the board
+    :param cols:        The number of columns in the board
+    :param length:      The number of tokens in a row needed to win
+    :return: The number of positions in the book
+    """
+    if (rows + 1) * cols > 64:
+        raise ValueError(f'Opening books only support boards with up to 64 bits, ({rows}+1)x{cols} is too big!')
+    positions: Dict[int, BitBoard] = {}
+    frontier = [BitBoard(rows, cols, length)]
+    for ply in range(plies + 1):
+        next_frontier: Dict[int, BitBoard] = {}
+        for board in frontier:  # Every board in the frontier is already stored under its own key
+            if has_won(board) or board.is_full():
+                continue
+            positions[board.key()] = board
+            for column in board.legal_moves() if ply < plies else ():
+                child = board.copy()
+                child.play(column)
+                key, is_mirrored = canonical(child)
+                if key not in next_frontier:
+                    next_frontier[key] = child.mirror() if is_mirrored else child
+        frontier = next_frontier.values()
+    keys = sorted(positions)
+    boards = [positions[key] for key in keys]
+    results = get_pool(workers).map(search_position, boards, [depth] * len(boards), [time_budget] * len(boards),
+                                    chunksize=max(1, len(boards) // 256))
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, rows, cols, length, plies, len(keys)))
+        for key, (score, move, _) in zip(keys, results):
+            f.write(RECORD.pack(key, move, int(score)))
+    return len(keys)
@@ -0,0 +1,118 @@
+"""
+Module client.py
+================
+
+This module contains the implementation of the GameClient class, an asyncio client for GameServer, and the scripted
+games used to test and load a server on localhost
+"""
+import asyncio
+import json
+import random
+from itertools import count
+from time import perf_counter
+from typing import Any, Dict, List, Union
+
+from src.constants import SERVER_HOST, SERVER_PORT
+from src.server import LatencyTracker, Reply
+
+__all__ = ['GameClient', 'play_scripted_game']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+class GameClient:
+    """
+    class GameClient:
+    -----------------
+
+    A connection to a GameServer that can have many requests in flight at once (Replies are matched to requests by
+    their id, so they can arrive in any order)
+    """
+
+    def __init__(self):
+        self.__reader: Union[asyncio.StreamReader, None] = None
+        self.__writer: Union[asyncio.StreamWriter, None] = None
+        self.__replies: Dict[int, asyncio.Future] = {}
+        self.__ids = count(1)
+        self.__receiver: Union[asyncio.Task, None] = None
+        self.latency: LatencyTracker = LatencyTracker()  # Round trips of every request, as seen by the client
+
+    async def connect(self, host: str = SERVER_HOST, port: int = SERVER_PORT) -> 'GameClient':
+        """
+        :param host:    The server's address
+        :param port:    The server's port
+        :return: This client, connected to the server
+        """
+        self.__reader, self.__writer = await asyncio.open_connection(host, port)
+        self.__receiver = asyncio.ensure_future(self.__receive())
+        return self
+
+    async def close(self) -> None:
+        """
+        Closes the connection, requests that are still waiting for a reply fail with ConnectionError
+        :return: None
+        """
+        if self.__writer is not None:
+            self.__writer.close()
+            await self.__receiver
+            self.__writer = None
+
+    async def __receive(self) -> None:
+        """
+        Task that reads the server's replies and hands each to the request that's waiting for it
+        :return: None
+        """
+        try:
+            async for line in self.__reader:
+                reply = json.loads(line)
+                future = self.__replies.pop(reply.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        except ConnectionError:
+            pass
+        finally:
+            for future in self.__replies.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('The connection to the server was closed!'))
+            self.__replies.clear()
+
+    async def request(self, op: str, **params: Any) -> Reply:
+        """
+        :param op:      The op to run (See server.py)
+        :param params:  The op's parameters
+        :return: The server's reply
+        :raises ValueError: If the server couldn't run the request
+        """
+        request_id = next(self.__ids)
+        future = self.__replies[request_id] = asyncio.get_running_loop().create_future()
+        start = perf_counter()
+        self.__writer.write(json.dumps({'id': request_id, 'op': op, **params}).encode() + b'\n')
+        await self.__writer.drain()
+        reply = await future
+        self.latency.add(perf_counter() - start)
+        if not reply['ok']:
+            raise ValueError(reply['error'])
+        return reply
+
+
+async def play_scripted_game(client: GameClient, rng: random.Random, engines: List[bool],
+                             **settings: Any) -> Dict[str, Any]:
+    """
+    Plays a whole game on the server, the human players pick random legal moves
+    :param client:      A connected client
+    :param rng:         The random number generator of the human players
+    :param engines:     Whether each player is an engine
+    :param settings:    The game's other parameters (e.g. depth, move_time, time_limit, rows, cols, length)
+    :return: The game's final state
+    """
+    state = await client.request('new', players=['engine' if engine else 'human' for engine in engines], **settings)
+    game = state['game']
+    try:
+        while state['turn'] is not None:
+            if engines[state['turn']]:
+                state = await client.request('play', game=game)
+            else:
+                state = await client.request('move', game=game, column=rng.choice(state['legal']))
+        return state
+    finally:
+        await client.request('close', game=game)
@@ -8,9 +8,7 @@ from __future__ import annotations
 
 from datetime import date
 from pathlib import Path
-from typing import Dict, List, Tuple
-
-import pygame
+from typing import Dict, Mapping, Tuple
 
 __version__ = '0.1'
 __author__ = 'Eric G.D'
@@ -18,11 +16,12 @@ __author__ = 'Eric G.D'
 # Types
 
 
-GameState = List[List[str]]
 Resolution = Tuple[int, int]
 ResDict = Dict[str, Resolution]
-ImageDict = Dict[str, Dict[str, pygame.Surface]]
+ImageDict = Dict[str, Mapping[str, 'pygame.Surface']]  # pygame is only imported by the GUI
 Position = Tuple[int, int]
+Geometry = Tuple[int, int, int]  # Rows, columns and the number of tokens in a row needed to win
+PatternTable = Tuple[int, ...]  # The score of every window pattern (See evaluation.py)
 Color = Tuple[int, int, int]
 
 # Game Logic Constants
@@ -34,8 +33,29 @@ BOARD_DIMENSIONS: Tuple[int, int] = (ROWS, COLS)
 NUM_OF_CELLS: int = ROWS * COLS
 NUM_OF_PLAYERS: int = 2
 WIN_LENGTH: int = 4
+TOKEN_COLORS: Tuple[str, ...] = ('red', 'yellow')  # Has to match the token_*.png assets
+OUTLINES: Tuple[str, ...] = ('normal', 'win')  # Has to match the board_*.png assets
 MAX_SCORE: int = 10 ** 5
+MAX_DEPTH: int = 0xFF  # The deepest search the transposition table can record
+MAX_HEURISTIC: int = MAX_SCORE - MAX_DEPTH - 1  # Heuristic scores are clamped to this, so they never look like wins
+SOLVER_MAX_EMPTY: int = 24  # Positions with more empty cells are searched heuristically by the 'perfect' difficulty
+SOLVER_TIME_BUDGET: float = 10.0  # The number of seconds the solver may take when the search has no time budget
+SOLVER_FALLBACK_DEPTH: int = 7  # The search depth used when a position isn't solved
+ENGINES: Tuple[str, ...] = ('alphabeta', 'mcts')  # The computer's search algorithms (See Player.engine)
+MCTS_EXPLORATION: float = 1.4  # The UCT exploration constant, higher values try less visited moves more often
 LOG_MESSAGE: str = '{0} {1:^22} {0}'
+LOG_SEARCH_STATS: bool = False  # Log the statistics of every search made by the computer (See SearchStats)
+
+
+# Server Constants
+
+
+SERVER_HOST: str = '127.0.0.1'  # The game server only accepts local connections by default
+SERVER_PORT: int = 4004
+SERVER_MAX_GAMES: int = 1000  # The number of games the server keeps at once (Finished games count until closed)
+SERVER_MAX_INFLIGHT: int = 8  # The number of requests of a connection that run at once, reading waits for the rest
+SERVER_MAX_SIDE: int = 16  # The most rows or columns a game hosted by the server can have
+LATENCY_WINDOW: int = 10000  # The number of recent samples the server's latency percentiles are computed from
 
 
 # Graphic Constants
@@ -58,9 +78,11 @@ title: str = 'Connect4Py'
 ASSETS_PATH: Path = Path('assets')
 icon_res: Resolution = (32, 32)
 icon_path: Path = ASSETS_PATH / 'icon.png'
-log_path: Path = Path('logs', f'connect4py_log_{date.today()}.txt')
-if not log_path.parent.is_dir():
-    log_path.parent.mkdir()
+book_path: Path = ASSETS_PATH / 'book.bin'
+weights_path: Path = ASSETS_PATH / 'weights.json'  # Evaluation weights (See evaluation.load_weights()), optional
+cache_path: Path = Path('cache')  # Scaled assets, created by AssetCache when it's first written to
+log_path: Path = Path('logs', f'connect4py_log_{date.today()}.txt')  # The directory is created by main.py
+records_path: Path = Path('logs', 'games.bin')  # Every finished game, see records.py (Index in games.idx)
 
 # Assertions
 
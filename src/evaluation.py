@@ -0,0 +1,219 @@
+"""
+Module evaluation.py
+====================
+
+This module contains the pattern tables used by evaluate() and the implementation of the EvalState class, which keeps
+evaluate()'s score up to date as moves are played and unplayed instead of rescanning the whole board at every leaf of
+the search.
+
+Every window (A line of WIN_LENGTH cells) is scored by its exact occupancy pattern: the pattern's index is a base 3
+number with a digit per cell of the window (0 for an empty cell, 1 for the first player's token and 2 for the second
+player's token, the window's first cell is the least significant digit), and a pattern table holds the score of every
+index from the first player's perspective. The default table only depends on the number of tokens of each player
+(See window_scores()), and tables can be loaded from a weights file tuned offline (See load_weights()).
+"""
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from src.bitboard import BitBoard, cell_windows, window_masks
+from src.constants import WIN_LENGTH, PatternTable
+
+__all__ = ['EvalState', 'WINDOW_SCORES', 'window_scores', 'pattern_table', 'pattern_index', 'load_weights',
+           'window_patterns']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+@lru_cache()
+def window_scores(length: int = WIN_LENGTH) -> Tuple[int, ...]:
+    """
+    :param length:  The number of tokens in a row needed to win
+    :return: The score of a window (A line of :length: cells) that only contains a single player's tokens, by number
+             of tokens (Every token multiplies the score by 4, full windows are scored by has_won() instead)
+    """
+    return (0,) + tuple(4 ** (tokens - 1) for tokens in range(1, length))
+
+
+WINDOW_SCORES: Tuple[int, ...] = window_scores(WIN_LENGTH)  # (0, 1, 4, 16)
+
+
+def pattern_index(pattern: str) -> int:
+    """
+    :param pattern: A window's cells, in order, as 'x' (The player's token), 'o' (The opponent's token) or '.'
+    :return: The pattern's index in a pattern table, with 'x' as the first player
+    :raises ValueError: If :pattern: contains other characters
+    """
+    if not set(pattern) <= set('xo.'):
+        raise ValueError(f"'{pattern}' is not a window pattern (Cells are 'x', 'o' or '.')!")
+    return sum('.xo'.index(cell) * 3 ** i for i, cell in enumerate(pattern))
+
+
+@lru_cache()
+def pattern_table(length: int = WIN_LENGTH, counts: Sequence[int] = None) -> PatternTable:
+    """
+    :param length:  The number of tokens in a row needed to win
+    :param counts:  The score of a window that only contains a single player's tokens, by number of tokens
+                    (Defaults to window_scores())
+    :return: A pattern table that scores each window by the number of tokens each player has in it (Windows with
+             both players' tokens are worth 0, and full windows are scored by has_won() instead)
+    """
+    counts = window_scores(length) if counts is None else tuple(counts)
+    table = []
+    for index in range(3 ** length):
+        digits = [index // 3 ** i % 3 for i in range(length)]
+        first, second = digits.count(1), digits.count(2)
+        table.append(0 if first and second or first + second == length else counts[first] - counts[second])
+    return tuple(table)
+
+
+def load_weights(path: Path) -> PatternTable:
+    """
+    Loads a pattern table from a JSON weights file with these fields:
+    * length:   The number of cells in a window
+    * counts:   (Optional) The score of a window that only contains a single player's tokens, by number of tokens
+    * table:    (Optional) The score of every pattern index, replaces the table built from :counts:
+    * patterns: (Optional) Scores of single patterns (See pattern_index()), the same pattern with the players'
+                tokens swapped gets the opposite score
+    :param path:    The path of the weights file
+    :return: The pattern table
+    :raises ValueError: If the file isn't a valid weights file (Including one that doesn't score empty windows 0)
+    """
+    try:
+        weights: Dict = json.loads(Path(path).read_text())
+        length = int(weights['length'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"'{path}' is not a weights file ({e})!")
+    if length < 2:
+        raise ValueError(f"'{path}' has an invalid window length ({length})!")
+    if 'table' in weights:
+        table = [int(score) for score in weights['table']]
+        if len(table) != 3 ** length:
+            raise ValueError(f"'{path}' has {len(table)} patterns instead of {3 ** length}!")
+    else:
+        counts = weights.get('counts')
+        if counts is not None and len(counts) != length:
+            raise ValueError(f"'{path}' has {len(counts)} counts instead of {length}!")
+        table = list(pattern_table(length, None if counts is None else tuple(int(score) for score in counts)))
+    for pattern, score in weights.get('patterns', {}).items():
+        if len(pattern) != length:
+            raise ValueError(f"'{pattern}' is not a window pattern of length {length}!")
+        table[pattern_index(pattern)] = int(score)
+        table[pattern_index(pattern.translate(str.maketrans('xo', 'ox')))] = -int(score)
+    if table[0]:
+        raise ValueError(f"'{path}' gives the empty window a score of {table[0]} instead of 0!")
+    return tuple(table)
+
+
+@lru_cache()
+def window_patterns(rows: int, cols: int, length: int = WIN_LENGTH) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :param length:  The number of tokens in a row needed to win
+    :return: For every window (In window_masks()), the bit index of each of its cells and the cell's place value in
+             the window's pattern index (Cells are ordered by bit index, which is also their order along the line)
+    """
+    windows = []
+    for window in window_masks(rows, cols, length):
+        bits = [bit for bit in range(window.bit_length()) if window >> bit & 1]
+        windows.append(tuple((bit, 3 ** i) for i, bit in enumerate(bits)))
+    return tuple(windows)
+
+
+@lru_cache()
+def cell_steps(rows: int, cols: int, length: int = WIN_LENGTH) -> Tuple[Tuple[Tuple[Tuple[int, int], ...], ...],
+                                                                         Tuple[Tuple[Tuple[int, int], ...], ...]]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :param length:  The number of tokens in a row needed to win
+    :return: For each player and every BitBoard bit index, the windows that contain the cell and how much a token of
+             the player there adds to each window's pattern index
+    """
+    places = [dict(window) for window in window_patterns(rows, cols, length)]
+    return tuple(tuple(tuple((window, (player + 1) * places[window][bit]) for window in windows)
+                       for bit, windows in enumerate(cell_windows(rows, cols, length)))
+                 for player in range(2))
+
+
+class EvalState:
+    """
+    class EvalState:
+    ----------------
+
+    The pattern index of every window of a BitBoard and the resulting score, which only has to update the windows
+    that contain the played cell on every move (A table lookup per window).
+    A BitBoard that has an EvalState attached (See EvalState.attach()) updates it in play() and unplay().
+    """
+    __slots__ = ('rows', 'cols', 'length', 'table', 'patterns', 'score')
+
+    def __init__(self, rows: int, cols: int, length: int = WIN_LENGTH, table: PatternTable = None):
+        """
+        :param rows:    The number of rows in the board
+        :param cols:    The number of columns in the board
+        :param length:  The number of tokens in a row needed to win
+        :param table:   The pattern table the windows are scored with, defaults to pattern_table()
+        """
+        if table is not None and len(table) != 3 ** length:
+            raise ValueError(f'The pattern table has {len(table)} patterns instead of {3 ** length}!')
+        self.rows: int = rows
+        self.cols: int = cols
+        self.length: int = length
+        self.table: PatternTable = pattern_table(length) if table is None else table
+        self.patterns: List[int] = [0] * len(window_masks(rows, cols, length))
+        self.score: int = sum(self.table[0] for _ in self.patterns)  # From the first player's perspective
+
+    def copy(self) -> 'EvalState':
+        """
+        :return: A copy of this state (The pattern table is shared)
+        """
+        other = EvalState.__new__(EvalState)
+        other.rows, other.cols, other.length, other.score = self.rows, self.cols, self.length, self.score
+        other.table, other.patterns = self.table, self.patterns[:]
+        return other
+
+    @staticmethod
+    def attach(board: BitBoard, table: PatternTable = None) -> BitBoard:
+        """
+        Creates an EvalState for the tokens already in :board: and attaches it to :board:
+        :param board:   A position
+        :param table:   The pattern table the windows are scored with, defaults to pattern_table()
+        :return: :board:
+        """
+        state = EvalState(board.rows, board.cols, board.length, table)
+        for bit in range(board.height * board.cols):
+            for player in range(2):
+                if board.masks[player] >> bit & 1:
+                    state.play(bit, player)
+        board.evaluation = state
+        return board
+
+    def play(self, bit: int, player: int) -> None:
+        """
+        Adds a token to every window that contains :bit:
+        :param bit:     The BitBoard bit index of the cell the token was placed in
+        :param player:  The index of the player that placed the token
+        :return: None
+        """
+        table, patterns, delta = self.table, self.patterns, 0
+        for window, step in cell_steps(self.rows, self.cols, self.length)[player][bit]:
+            old = patterns[window]
+            patterns[window] = old + step
+            delta += table[old + step] - table[old]
+        self.score += delta
+
+    def unplay(self, bit: int, player: int) -> None:
+        """
+        Removes a token from every window that contains :bit:
+        :param bit:     The BitBoard bit index of the cell the token was removed from
+        :param player:  The index of the player that placed the token
+        :return: None
+        """
+        table, patterns, delta = self.table, self.patterns, 0
+        for window, step in cell_steps(self.rows, self.cols, self.length)[player][bit]:
+            old = patterns[window]
+            patterns[window] = old - step
+            delta += table[old - step] - table[old]
+        self.score += delta
@@ -0,0 +1,401 @@
+"""
+Module game.py
+==============
+
+This module contains the implementation of the Game and Token classes, the rules and state of a game without any
+graphics (It doesn't import pygame, so it can be used by worker processes and headless programs)
+"""
+import copy
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from src.ai import SearchContext, has_won
+from src.bitboard import BitBoard
+from src.book import OpeningBook
+from src.constants import LOG_SEARCH_STATS, MAX_DEPTH, OUTLINES, TOKEN_COLORS, WIN_LENGTH, PatternTable
+from src.evaluation import EvalState
+from src.mcts import MCTSTree, parallel_mcts
+from src.parallel import parallel_search
+from src.player import Player
+from src.solver import search
+from src.stats import SearchStats
+from src.transposition import TranspositionTable
+
+__all__ = ['Game', 'Token']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+class Token:
+    """
+    class Token:
+    ------------
+
+    An immutable token, there is a single shared instance for each combination of color and outline
+    (Token(color, outline) always returns the same object, so the arguments are only validated the first time).
+    Boards store tokens as their codes, the index of the color in TOKEN_COLORS plus one (0 for no token) in the
+    lower four bits and the index of the outline in OUTLINES in the upper four bits.
+    """
+    __slots__ = ('__color', '__outline', '__code')
+    __instances: Dict[Tuple[Union[str, None], str], 'Token'] = {}
+    __codes: Dict[int, 'Token'] = {}
+
+    def __new__(cls, color: str = None, outline: str = 'normal') -> 'Token':
+        token = Token.__instances.get((color, outline))
+        if token is None:
+            if color is not None and color not in TOKEN_COLORS:
+                raise ValueError(f"'{color}' is not a valid token color!")
+            if outline not in OUTLINES:
+                raise ValueError(f"'{outline}' is not a valid token outline!")
+            token = super().__new__(cls)
+            token.__color, token.__outline = color, outline
+            token.__code = (0 if color is None else TOKEN_COLORS.index(color) + 1) | (OUTLINES.index(outline) << 4)
+            Token.__instances[color, outline] = Token.__codes[token.__code] = token
+        return token
+
+    def __reduce__(self) -> Tuple[type, Tuple[Union[str, None], str]]:
+        return Token, (self.__color, self.__outline)  # Unpickled tokens are the shared instances as well
+
+    def __bool__(self) -> bool:
+        return self.__color is not None
+
+    def __str__(self) -> str:
+        return self.__color[0].title()
+
+    def __repr__(self) -> str:
+        return f'Token({self.__color!r}, {self.__outline!r})'
+
+    @staticmethod
+    def from_code(code: int) -> 'Token':
+        """
+        :param code:    A code of a token that was already created
+        :return: The token with the code :code:
+        """
+        return Token.__codes[code]
+
+    @property
+    def color(self) -> str:
+        return self.__color
+
+    @property
+    def outline(self) -> str:
+        return self.__outline
+
+    @property
+    def code(self) -> int:
+        return self.__code
+
+
+class Game:
+    """
+    class Game:
+    -----------
+
+    The state of a game and its rules, and the entry point to the AI (See Board for the graphical version)
+    """
+    difficulty: Dict[str, int] = {
+        'very easy': 1,
+        'easy': 2,
+        'medium': 3,
+        'hard': 5,
+        'expert': 7,
+        'perfect': MAX_DEPTH  # Reaches the end of the game, so the position is solved
+    }
+    playouts: Dict[str, int] = {  # The 'mcts' engine's number of playouts per move for each difficulty
+        'very easy': 100,
+        'easy': 300,
+        'medium': 1000,
+        'hard': 3000,
+        'expert': 10000,
+        'perfect': 30000
+    }
+    table_size_mb: float = 16  # The size of each player's transposition table
+    keep_table: bool = True  # Keep each player's transposition table (And MCTS tree) between their searches in a game
+    workers: int = 1  # The number of processes used by each search (Root moves are split between them)
+    book: Union[OpeningBook, None] = None  # Consulted before searching, see build_book.py
+    weights: Union[PatternTable, None] = None  # The evaluation's pattern table (Used if its win length matches)
+    log_stats: bool = LOG_SEARCH_STATS  # Log the statistics of every search as a JSON line (See SearchStats.log())
+
+    def __init__(self, rows: int, cols: int, players: Tuple[Player, Player], length: int = WIN_LENGTH):
+        if min(rows, cols) < length or length < 2:
+            raise ValueError(f'A {rows}x{cols} board is too small to connect {length}!')
+        weights = self.weights if self.weights is not None and len(self.weights) == 3 ** length else None
+        self.__rows: int = rows
+        self.__cols: int = cols
+        self.__length: int = length
+        self.__turn_num: int = 0
+        self.__grid: bytearray = bytearray([Token().code]) * (rows * cols)  # Token codes, row by row from the bottom
+        self.__moves: List[Tuple[int, int]] = []  # The column and row of every move, in order
+        self.__undone: List[Tuple[int, str]] = []  # The column and color of every move that was undone
+        self.__dirty: Set[Tuple[int, int]] = {(row, column) for row in range(rows) for column in range(cols)}
+        self.__players: Tuple[Player, Player] = players
+        self.__available_moves: Set[int] = set(range(cols))
+        self.__bitboard: BitBoard = EvalState.attach(BitBoard(rows, cols, length), weights)
+        self.__tables: Dict[str, TranspositionTable] = {}  # Player color -> The player's transposition table
+        self.__trees: Dict[str, MCTSTree] = {}  # Player color -> The player's MCTS tree
+        self.__last_search: Union[SearchContext, None] = None
+        self.__last_stats: Union[SearchStats, None] = None
+
+    def __len__(self) -> int:
+        return self.__rows
+
+    def __iter__(self) -> Iterable[List[Token]]:
+        return ([self.cell(row, column) for column in range(self.__cols)] for row in range(self.__rows))
+
+    def cell(self, row: int, column: int) -> Token:
+        """
+        :param row:     The index of the row, 0 being the bottom row
+        :param column:  The index of the column
+        :return: The token in the cell (An empty token if there is none)
+        """
+        return Token.from_code(self.__grid[row * self.__cols + column])
+
+    def convert(self) -> BitBoard:
+        """
+        :return: A simplified version of this object for use in the negamax algorithm
+        """
+        return self.__bitboard.copy()
+
+    def negamax(self, depth: str = None, time_budget: float = None, workers: int = None,
+                weights: PatternTable = None) -> int:
+        """
+        :param depth:       A key for Game.difficulty used to get the maximum search depth ('perfect' solves the
+                            position exactly once at most SOLVER_MAX_EMPTY cells are empty, see solver.search())
+        :param time_budget: The number of seconds the search may take, if given the search deepens one ply at a
+                            time (Up to :depth: if it was given) and returns the best move found when time runs out
+        :param workers:     The number of processes to search with, defaults to Game.workers
+        :param weights:     The pattern table to evaluate positions with, defaults to the game's (See Game.weights)
+        :return: The best column to pick for the next turn
+        """
+        board = self.convert()
+        if weights is not None:
+            EvalState.attach(board, weights)
+        move_set = copy.deepcopy(self.__available_moves)
+        self.__last_search = self.__last_stats = None
+        book_move = self.book_move()
+        if book_move in move_set:
+            return book_move
+        workers = self.workers if workers is None else workers
+        max_depth = self.difficulty.get(depth, None if time_budget is not None else self.difficulty['medium'])
+        if workers > 1:
+            *_, self.__last_stats = parallel_search(board, move_set, max_depth, workers, time_budget,
+                                                   self.table_size_mb)
+        else:
+            color = self.get_current_player().color
+            table = self.__tables.get(color)
+            if table is None or not self.keep_table:
+                table = self.__tables[color] = TranspositionTable(self.table_size_mb)
+            table.new_search()
+            context = self.__last_search = SearchContext(table)
+            self.__last_stats = search(board, move_set, max_depth, context, time_budget)
+        if self.log_stats:
+            self.__last_stats.log('negamax')
+        return self.__last_stats.move
+
+    def mcts(self, depth: str = None, time_budget: float = None, workers: int = None) -> int:
+        """
+        :param depth:       A key for Game.playouts used to get the number of playouts
+        :param time_budget: The number of seconds the search may take, if given the search runs until the time runs
+                            out (Or until :depth:'s playouts were made if it was given)
+        :param workers:     The number of processes to search with (Each with its own tree), defaults to Game.workers
+        :return: The best column to pick for the next turn according to a Monte Carlo Tree Search (See mcts.py)
+        """
+        board = self.convert()
+        self.__last_search = self.__last_stats = None
+        book_move = self.book_move()
+        if book_move in self.__available_moves:
+            return book_move
+        workers = self.workers if workers is None else workers
+        playouts = self.playouts.get(depth, None if time_budget is not None else self.playouts['medium'])
+        if workers > 1:
+            *_, self.__last_stats = parallel_mcts(board, playouts, workers, time_budget)
+        else:
+            color = self.get_current_player().color
+            tree = self.__trees.get(color)
+            if tree is None or not self.keep_table or not tree.advance(board):
+                tree = self.__trees[color] = MCTSTree(board)
+            self.__last_stats = tree.search(playouts, time_budget)
+        if self.log_stats:
+            self.__last_stats.log('mcts')
+        return self.__last_stats.move
+
+    def engine_move(self, depth: str = None, time_budget: float = None, workers: int = None) -> int:
+        """
+        Searches with the engine of the player to move (See Player.engine)
+        :param depth:       A key for Game.difficulty (Or Game.playouts for the 'mcts' engine)
+        :param time_budget: The number of seconds the search may take
+        :param workers:     The number of processes to search with, defaults to Game.workers
+        :return: The best column to pick for the next turn
+        """
+        if self.get_current_player().engine == 'mcts':
+            return self.mcts(depth, time_budget, workers)
+        return self.negamax(depth, time_budget, workers)
+
+    def book_move(self) -> int:
+        """
+        :return: The best column to pick for the next turn according to Game.book, -1 if it's not in the book
+        """
+        entry = self.book.probe(self.__bitboard) if self.book is not None else None
+        return -1 if entry is None else entry[0]
+
+    def get_current_player(self) -> Player:
+        """
+        :return: The player who is currently playing
+        """
+        return self.__players[self.__turn_num % len(self.__players)]
+
+    def get_winning_player(self) -> Union[str, None]:
+        """
+        :return: The color of the player who has won, None otherwise
+        """
+        if not self.__turn_num or not has_won(self.__bitboard):
+            return None
+        return self.__players[(self.__turn_num - 1) % len(self.__players)].color
+
+    def is_full(self) -> bool:
+        """
+        :return: True if there are no empty spaces in the board, False otherwise
+        """
+        # return self.__turn_num >= self.tile_num
+        return not self.__available_moves
+
+    def lowest_space(self, column: int) -> int:
+        """
+        :param column: The column to check
+        :return: The index of lowest empty slot in :column:
+        """
+        row = self.__bitboard.heights[column] - column * self.__bitboard.height
+        return row if row < self.rows else -1
+
+    def column_full(self, column: int) -> bool:
+        """
+        :param column:  The index of a column
+        :return: True if the column is full, False otherwise
+        """
+        return not self.__bitboard.can_play(column)
+
+    def check_move(self, column: int) -> None:
+        """
+        :param column:  The index of a column
+        :return: None
+        :raises ValueError: If a token can't be inserted into :column:
+        """
+        if not 0 <= column < self.cols:
+            raise ValueError(f'Invalid column index, {column} is not between 0 and {self.cols}')
+        if column not in self.__available_moves:
+            raise ValueError(f'Cannot insert token into column {column} as it is full.')
+
+    def insert(self, column: int, color: str) -> None:
+        """
+        Inserts a :color: token into :board:'s :column:th column
+        :param column:  The index of the column that the new token will be inserted into
+        :param color:   The color of the new token
+        :return: None
+        """
+        self.check_move(column)
+        self.__undone.clear()
+        self.__place(self.lowest_space(column), column, color)
+
+    def __place(self, row: int, column: int, color: str) -> None:
+        """
+        Places a :color: token in the cell at :row:, :column: and records the move
+        :param row:     The index of the lowest empty cell in :column:
+        :param column:  The index of the column
+        :param color:   The color of the token
+        :return: None
+        """
+        self.__grid[row * self.__cols + column] = Token(color).code
+        self.__bitboard.play(column)
+        self.__moves.append((column, row))
+        self.__dirty.add((row, column))
+        self.__turn_num += 1
+        if row == self.rows - 1:
+            self.__available_moves.remove(column)
+
+    def undo(self) -> int:
+        """
+        Takes back the last move
+        :return: The column of the move that was taken back, -1 if no moves were made
+        """
+        if not self.__moves:
+            return -1
+        column, row = self.__moves.pop()
+        self.__undone.append((column, self.cell(row, column).color))
+        self.__grid[row * self.__cols + column] = Token().code
+        self.__bitboard.unplay(column)
+        self.__dirty.add((row, column))
+        self.__turn_num -= 1
+        self.__available_moves.add(column)
+        return column
+
+    def redo(self) -> int:
+        """
+        Plays the last move that was taken back by undo() again (Inserting a token clears the moves that can be redone)
+        :return: The column of the move that was played, -1 if there are no moves to redo
+        """
+        if not self.__undone:
+            return -1
+        column, color = self.__undone.pop()
+        self.__place(self.lowest_space(column), column, color)
+        return column
+
+    def take_dirty_cells(self) -> Set[Tuple[int, int]]:
+        """
+        :return: The (row, column) of every cell that changed since the last call (Every cell on the first call)
+        """
+        dirty, self.__dirty = self.__dirty, set()
+        return dirty
+
+    def position_at(self, ply: int) -> BitBoard:
+        """
+        :param ply: The number of moves to replay (Negative values count back from the last move)
+        :return: The position after the first :ply: moves of this game
+        """
+        board = BitBoard(self.rows, self.cols, self.length)
+        for column, _ in self.__moves[:ply]:
+            board.play(column)
+        return board
+
+    @property
+    def moves(self) -> Tuple[int, ...]:
+        """
+        :return: The column of every move made so far, in order
+        """
+        return tuple(column for column, _ in self.__moves)
+
+    @property
+    def last_search(self) -> Union[SearchContext, None]:
+        """
+        :return: The context of the last heuristic search made by negamax() in this process, None if the move came
+                 from the book or from worker processes (See last_stats for every search)
+        """
+        return self.__last_search
+
+    @property
+    def last_stats(self) -> Union[SearchStats, None]:
+        """
+        :return: The statistics of the last search made by negamax() or mcts(), None if the move came from the book
+        """
+        return self.__last_stats
+
+    @property
+    def players(self) -> Tuple[Player, Player]:
+        return self.__players
+
+    @property
+    def rows(self) -> int:
+        return self.__rows
+
+    @property
+    def cols(self) -> int:
+        return self.__cols
+
+    @property
+    def length(self) -> int:
+        """
+        :return: The number of tokens in a row needed to win
+        """
+        return self.__length
+
+    @property
+    def tile_num(self) -> int:
+        return self.__rows * self.__cols
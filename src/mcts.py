@@ -0,0 +1,310 @@
+"""
+Module mcts.py
+==============
+
+This module contains the Monte Carlo Tree Search engine, an alternative to alpha_beta() that needs a playout or time
+budget instead of a search depth.
+
+Every iteration walks down the tree by UCT (The move with the best average result plus an exploration bonus for
+rarely visited moves), adds one new node, finishes the game from there with a playout and adds the result to every
+node on the way. Playouts are played on a BitBoard and are heuristic: a player always takes an immediate win and
+otherwise plays a random move that doesn't let the opponent win right away (See BitBoard.non_losing_moves()), which
+is also how the tree's moves are pruned. The move that was visited the most is played.
+"""
+import os
+import random
+from math import log, sqrt
+from time import perf_counter
+from typing import Dict, List, Tuple, Union
+
+from src.ai import has_won
+from src.bitboard import BitBoard, column_masks
+from src.constants import MCTS_EXPLORATION
+from src.parallel import get_pool
+from src.stats import SearchStats
+
+__all__ = ['MCTSNode', 'MCTSTree', 'candidate_moves', 'playout', 'mcts_position', 'parallel_mcts']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+RootStats = List[Tuple[int, int, float]]  # The column, visits and total result of every move of the root
+
+_tree: Union['MCTSTree', None] = None  # Each worker process keeps its own tree between tasks
+
+
+def candidate_moves(board: BitBoard) -> List[int]:
+    """
+    :param board:   A position where the game isn't over
+    :return: The columns worth playing in :board: (Only the first immediate win if there is one, otherwise the moves
+             that don't let the opponent win right away, or every legal move if they all do)
+    """
+    masks = column_masks(board.rows, board.cols)
+    possible = board.possible()
+    wins = board.winning_cells(board.player) & possible
+    if wins:
+        return [next(column for column in range(board.cols) if wins & masks[column])]
+    candidates = board.non_losing_moves() or possible
+    return [column for column in range(board.cols) if candidates & masks[column]]
+
+
+def playout(board: BitBoard, rng: random.Random) -> Union[int, None]:
+    """
+    Finishes the game from :board: with random moves, except that immediate wins are always taken and moves that let
+    the opponent win right away are never played (Unless every move does, which ends the playout as a loss)
+    :param board:   A position where the game isn't over, the playout's moves are played in place
+    :param rng:     The random number generator to use
+    :return: The index of the player that won, None for a draw
+    """
+    masks = column_masks(board.rows, board.cols)
+    wins = board.winning_cells(board.player)
+    while not board.is_full():
+        player, possible = board.player, board.possible()
+        if wins & possible:
+            return player
+        threats = board.winning_cells(1 - player)  # Same as BitBoard.non_losing_moves()
+        forced = possible & threats
+        if forced & (forced - 1):
+            return 1 - player
+        candidates = (forced or possible) & ~(threats >> 1)
+        if not candidates:
+            return 1 - player
+        board.play(rng.choice([column for column in range(board.cols) if candidates & masks[column]]))
+        wins = threats & ~board.mask  # Only the opponent's move changed, so their winning cells are still known
+    return None
+
+
+class MCTSNode:
+    """
+    class MCTSNode:
+    ---------------
+
+    A position in the search tree: the move that led to it, the player who made that move, the moves that haven't
+    been expanded yet and the number of playouts through it along with their total result for that player (1 for a
+    win, 0.5 for a draw)
+    """
+    __slots__ = ('move', 'player', 'parent', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move: int, player: int, parent: 'MCTSNode' = None, untried: List[int] = None):
+        self.move: int = move
+        self.player: int = player
+        self.parent: Union[MCTSNode, None] = parent
+        self.children: List[MCTSNode] = []
+        self.untried: List[int] = [] if untried is None else untried  # Empty in positions where the game is over
+        self.visits: int = 0
+        self.wins: float = 0.0
+
+    def __repr__(self) -> str:
+        return f'MCTSNode({self.move}, visits={self.visits}, wins={self.wins})'
+
+    def select(self, exploration: float) -> 'MCTSNode':
+        """
+        :param exploration: The UCT exploration constant
+        :return: The child with the highest UCT value
+        """
+        log_visits = log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits +
+                   exploration * sqrt(log_visits / child.visits))
+
+    def best_child(self) -> Union['MCTSNode', None]:
+        """
+        :return: The child that was visited the most, None if there are no children
+        """
+        return max(self.children, key=lambda child: child.visits, default=None)
+
+
+class MCTSTree:
+    """
+    class MCTSTree:
+    ---------------
+
+    A search tree and the position at its root.
+    The tree can be kept between moves: advance() moves the root down to the position reached by the moves played
+    since the last search, so the playouts already made through it aren't lost.
+    """
+
+    def __init__(self, board: BitBoard, exploration: float = MCTS_EXPLORATION, seed: int = None):
+        """
+        :param board:       The position at the root of the tree
+        :param exploration: The UCT exploration constant
+        :param seed:        The seed of the tree's random number generator
+        """
+        self.board: BitBoard = board.copy()
+        self.board.evaluation = None  # Playouts never evaluate positions
+        self.exploration: float = exploration
+        self.rng: random.Random = random.Random(seed)
+        self.root: MCTSNode = self.__new_node(-1, None, self.board)
+
+    @staticmethod
+    def __new_node(move: int, parent: Union[MCTSNode, None], board: BitBoard) -> MCTSNode:
+        """
+        :param move:    The move that led to :board:, -1 for the root
+        :param parent:  The node of the position before :move:
+        :param board:   The node's position
+        :return: A node for :board:, without candidate moves if the game is over
+        """
+        over = board.is_full() or bool(board.played) and has_won(board)
+        return MCTSNode(move, 1 - board.player, parent, None if over else candidate_moves(board))
+
+    def advance(self, board: BitBoard) -> bool:
+        """
+        Moves the root to :board:, keeping the subtree of the new root if :board: was reached from the tree's position
+        by moves that were already expanded, and starting a new tree otherwise
+        :param board:   The position to search next
+        :return: True if part of the tree was kept, False otherwise
+        """
+        same_game = (board.rows, board.cols, board.length) == (self.board.rows, self.board.cols, self.board.length) \
+            and board.played[:self.board.moves] == self.board.played
+        node = self.root if same_game else None
+        for bit in board.played[self.board.moves:] if same_game else ():
+            node = next((child for child in node.children if child.move == bit // board.height), None)
+            if node is None:
+                break
+        self.board = board.copy()
+        self.board.evaluation = None
+        if node is None:
+            self.root = self.__new_node(-1, None, self.board)
+            return False
+        self.root, node.parent = node, None
+        return True
+
+    def run(self, playouts: int = None, deadline: float = None) -> Tuple[int, int]:
+        """
+        Runs iterations until :playouts: were made or :deadline: has passed (At least one is always made)
+        :param playouts:    The number of iterations to run, None to run until :deadline:
+        :param deadline:    The time (perf_counter) at which the search has to stop, None to run :playouts:
+        :return: The number of iterations that were run and the deepest ply (From the root) they reached
+        """
+        rng, exploration, count, max_depth = self.rng, self.exploration, 0, 0
+        while count == 0 or (playouts is None or count < playouts) and (deadline is None or perf_counter() < deadline):
+            node, board, depth = self.root, self.board.copy(), 0
+            while not node.untried and node.children:
+                node = node.select(exploration)
+                board.play(node.move)
+                depth += 1
+            if node.untried:
+                column = node.untried.pop(rng.randrange(len(node.untried)))
+                board.play(column)
+                child = self.__new_node(column, node, board)
+                node.children.append(child)
+                node, depth = child, depth + 1
+            if board.played and has_won(board):
+                winner = 1 - board.player
+            else:
+                winner = None if board.is_full() else playout(board, rng)
+            while node is not None:
+                node.visits += 1
+                node.wins += 1.0 if winner == node.player else 0.5 if winner is None else 0.0
+                node = node.parent
+            count += 1
+            max_depth = max(max_depth, depth)
+        return count, max_depth
+
+    def root_stats(self) -> RootStats:
+        """
+        :return: The column, number of visits and total result of every move of the root that was expanded
+        """
+        return [(child.move, child.visits, child.wins) for child in self.root.children]
+
+    def principal_variation(self, max_length: int = None) -> List[int]:
+        """
+        :param max_length:  The maximum number of moves to return
+        :return: The most visited move of the root, followed by the most visited reply to it and so on
+        """
+        pv, node = [], self.root.best_child()
+        while node is not None and (max_length is None or len(pv) < max_length):
+            pv.append(node.move)
+            node = node.best_child()
+        return pv
+
+    def search(self, playouts: int = None, time_budget: float = None) -> SearchStats:
+        """
+        :param playouts:    The number of iterations to run, None for no limit (Only with a time budget)
+        :param time_budget: The number of seconds the search may take, None to run exactly :playouts: iterations
+        :return: The statistics of the search: its nodes are the number of iterations, and its score is the average
+                 result of the chosen move from the perspective of the player to move (From -1 for a loss to 1 for a
+                 win)
+        """
+        start = perf_counter()
+        count, depth = self.run(playouts, None if time_budget is None else start + time_budget)
+        stats = SearchStats()
+        stats.nodes, stats.seconds, stats.depth = count, perf_counter() - start, depth
+        stats.iterations = [(depth, stats.seconds, count)]
+        stats.pv = self.principal_variation(depth)
+        best = self.root.best_child()
+        if best is not None:
+            stats.move, stats.score = best.move, 2 * best.wins / best.visits - 1
+        return stats
+
+
+def mcts_position(board: BitBoard, playouts: Union[int, None], time_budget: float = None,
+                  seed: int = None) -> Tuple[float, int, SearchStats, RootStats]:
+    """
+    Runs a search in a single worker process, the worker keeps its tree for its next search of the same game
+    :param board:       The position to search
+    :param playouts:    The number of iterations to run, None for no limit (Only with a time budget)
+    :param time_budget: The number of seconds the search may take, None to run exactly :playouts: iterations
+    :param seed:        The seed of the tree's random number generator (Only used if a new tree is created)
+    :return: The score of :board:, the best column to play, the search's statistics and the results of every move
+             of the root
+    """
+    global _tree
+    if _tree is None or not _tree.advance(board):
+        _tree = MCTSTree(board, seed=seed)
+    stats = _tree.search(playouts, time_budget)
+    return stats.score, stats.move, stats, _tree.root_stats()
+
+
+def _search_share(board: BitBoard, playouts: Union[int, None], time_budget: Union[float, None],
+                  seed: int) -> Tuple[float, int, SearchStats, RootStats]:
+    """
+    Runs in a worker process, searches one share of parallel_mcts() with a new tree (A worker's kept tree could
+    already hold another share's playouts of the same position, which would then be counted twice)
+    :param board:       The position to search
+    :param playouts:    The number of iterations to run, None for no limit (Only with a time budget)
+    :param time_budget: The number of seconds the search may take, None to run exactly :playouts: iterations
+    :param seed:        The seed of the tree's random number generator
+    :return: The same as mcts_position()
+    """
+    tree = MCTSTree(board, seed=seed)
+    stats = tree.search(playouts, time_budget)
+    return stats.score, stats.move, stats, tree.root_stats()
+
+
+def parallel_mcts(board: BitBoard, playouts: Union[int, None], workers: int = None,
+                  time_budget: float = None) -> Tuple[float, int, SearchStats]:
+    """
+    Searches :board: with an independent, newly seeded tree per worker task (Root parallelism), each making its share
+    of :playouts:, and plays the move with the most visits across every tree
+    :param board:       The position to search
+    :param playouts:    The total number of iterations to run, None for no limit (Only with a time budget)
+    :param workers:     The number of worker processes, defaults to the number of CPUs
+    :param time_budget: The number of seconds the search may take, None to run exactly :playouts: iterations
+    :return: The score of the best move (See MCTSTree.search()), the move (-1 if there is none) and the combined
+             statistics of every worker's search
+    """
+    workers = workers or os.cpu_count() or 1
+    shares = [None] * workers if playouts is None else \
+        [playouts // workers + (i < playouts % workers) for i in range(workers)]
+    seeds = random.Random().sample(range(1 << 30), workers)
+    futures = [get_pool(workers).submit(_search_share, board, share, time_budget, seed)
+               for share, seed in zip(shares, seeds) if share != 0]
+    results = [future.result() for future in futures]
+    totals: Dict[int, List[float]] = {}
+    for *_, root in results:
+        for column, visits, wins in root:
+            total = totals.setdefault(column, [0, 0.0])
+            total[0] += visits
+            total[1] += wins
+    stats = SearchStats()
+    for _, _, result, _ in results:
+        stats.nodes += result.nodes
+        stats.seconds = max(stats.seconds, result.seconds)
+        stats.depth = max(stats.depth, result.depth)
+    stats.iterations = [(stats.depth, stats.seconds, stats.nodes)]
+    if totals:
+        stats.move = max(totals, key=lambda column: totals[column][0])
+        visits, wins = totals[stats.move]
+        stats.score = 2 * wins / visits - 1
+        stats.pv = max((result for _, _, result, _ in results if result.move == stats.move),
+                       key=lambda result: result.nodes, default=SearchStats()).pv or [stats.move]
+    return stats.score, stats.move, stats
@@ -0,0 +1,255 @@
+"""
+Module parallel.py
+==================
+
+This module contains the root-parallel version of the NegaMax search, which splits the moves of a position between
+the processes of a shared process pool.
+The first move is searched on its own, and its score is the alpha of the other moves, which are searched in parallel
+(Young Brothers Wait), each starting with the best score found so far.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import count
+from math import inf
+from time import perf_counter, time
+from typing import Iterable, List, Tuple, Union
+
+from src.ai import SearchContext, SearchTimeout, alpha_beta, order_moves
+from src.bitboard import BitBoard
+from src.constants import MAX_DEPTH, MAX_SCORE, SOLVER_FALLBACK_DEPTH, SOLVER_MAX_EMPTY, PatternTable
+from src.evaluation import EvalState
+from src.solver import search
+from src.stats import SearchStats
+from src.transposition import TranspositionTable
+
+__all__ = ['get_pool', 'shutdown_pool', 'search_position', 'parallel_search']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+_pool: Union[ProcessPoolExecutor, None] = None
+_pool_workers: int = 0
+_table: Union[TranspositionTable, None] = None  # Each worker process keeps its own table between tasks
+# The settings of the searches that filled _table: rows, cols, length, depth, time budget and pattern table
+# (Keys don't include the length, and a deep search's results would make a shallower one play like it)
+TableSettings = Tuple[int, int, int, Union[int, None], Union[float, None], Union[PatternTable, None]]
+_table_settings: Union[TableSettings, None] = None
+_search_id: Union[Tuple[int, int], None] = None  # The root search that the worker's last task belonged to
+_search_ids = count(1)
+MoveResult = Tuple[Union[float, None], int, SearchStats]  # See _search_move()
+
+
+def get_pool(workers: int = None) -> ProcessPoolExecutor:
+    """
+    :param workers: The number of worker processes, defaults to the number of CPUs
+    :return: The shared process pool, it is only recreated if :workers: changed since the last call
+    """
+    global _pool, _pool_workers
+    workers = workers or os.cpu_count() or 1
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool, _pool_workers = ProcessPoolExecutor(max_workers=workers), workers
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """
+    Stops the worker processes of the shared process pool, if it was created
+    :return: None
+    """
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+    _pool, _pool_workers = None, 0
+
+
+def _worker_context(board: BitBoard, table_size_mb: float, depth: Union[int, None],
+                    time_budget: Union[float, None], search_id: Tuple[int, int] = None) -> SearchContext:
+    """
+    The worker's table is cleared when the searches' settings change (Another geometry, difficulty or set of weights)
+    :param board:           The position that will be searched (With its EvalState attached)
+    :param table_size_mb:   The size of the worker's transposition table
+    :param depth:           The maximum search depth of the search
+    :param time_budget:     The time budget of the search
+    :param search_id:       The root search that the task belongs to, the table's entries are only marked as old by
+                            the first task of a root search (None for tasks that search a whole position)
+    :return: A new search context that uses the current worker process's transposition table
+    """
+    global _table, _table_settings, _search_id
+    if _table is None:
+        _table = TranspositionTable(table_size_mb)
+    settings = board.rows, board.cols, board.length, depth, time_budget, board.evaluation.table
+    if _table_settings != settings:
+        _table.clear()
+        _table_settings = settings
+    if search_id is None or search_id != _search_id:
+        _table.new_search()
+    _search_id = search_id
+    return SearchContext(_table)
+
+
+def search_position(board: BitBoard, depth: int, time_budget: float = None,
+                    table_size_mb: float = 16) -> Tuple[float, int, SearchStats]:
+    """
+    Searches a whole position in a single worker process (Used to search in the background)
+    :param board:           The position to search
+    :param depth:           The maximum search depth (in plies)
+    :param time_budget:     The number of seconds the search may take, None to search exactly :depth: plies
+    :param table_size_mb:   The size of the worker's transposition table
+    :return: The score of :board:, the best column to play and the search's statistics
+    """
+    if board.evaluation is None:
+        EvalState.attach(board)
+    context = _worker_context(board, table_size_mb, depth, time_budget)
+    stats = search(board, board.legal_moves(), depth, context, time_budget)
+    return stats.score, stats.move, stats
+
+
+def _search_move(board: BitBoard, column: int, depth: int, alpha: float, deadline: Union[float, None],
+                 table_size_mb: float, settings: Tuple[Union[int, None], Union[float, None]],
+                 search_id: Tuple[int, int], exact: bool = False) -> MoveResult:
+    """
+    Runs in a worker process, scores a single root move with the window (:alpha:, inf)
+    :param board:           The root position
+    :param column:          The move to score
+    :param depth:           The search depth of the root position
+    :param alpha:           The score the player to move in :board: is already guaranteed by another move
+    :param deadline:        The time (time.time()) at which the search has to stop, None to search exactly :depth:
+                            plies
+    :param table_size_mb:   The size of the worker's transposition table
+    :param settings:        The depth and time budget of the whole root search (See _worker_context())
+    :param search_id:       The root search that the task belongs to
+    :param exact:           Solve the position after :column: with solver.search() instead (:alpha: isn't used,
+                            :depth: has to reach the end of the game)
+    :return: The score of :column: from the perspective of the player to move in :board: (At most :alpha: if it
+             isn't better than :alpha:, None if the deadline passed first), :column: and the search's statistics
+    """
+    if board.evaluation is None:
+        EvalState.attach(board)
+    context = _worker_context(board, table_size_mb, *settings, search_id)
+    board.play(column)
+    if exact:
+        stats = search(board, board.legal_moves(), depth - 1, context,
+                       None if deadline is None else max(0.0, deadline - time()))
+    else:
+        context.deadline = None if deadline is None else perf_counter() + (deadline - time())
+        try:
+            score, move = alpha_beta(board, board.legal_moves(), -inf, -alpha, depth - 1, context)
+        except SearchTimeout:
+            return None, column, SearchStats.collect(context, board, 0, -1, 0)
+        stats = SearchStats.collect(context, board, score, move, depth - 1)
+    stats.score, stats.move, stats.depth, stats.pv = -stats.score, column, stats.depth + 1, [column] + stats.pv
+    return stats.score, column, stats
+
+
+def _split_search(pool: ProcessPoolExecutor, workers: int, board: BitBoard, move_set: List[int], depth: int,
+                  deadline: Union[float, None], table_size_mb: float,
+                  settings: Tuple[Union[int, None], Union[float, None]],
+                  search_id: Tuple[int, int]) -> List[MoveResult]:
+    """
+    Searches the first move of :move_set: with a full window, and then the other moves in parallel (At most :workers:
+    at once) with the best score found so far as their alpha
+    :param pool:            The process pool to search in
+    :param workers:         The number of worker processes in :pool:
+    :param board:           The position to search
+    :param move_set:        The columns to search, ordered from the most to the least promising
+    :param depth:           The search depth
+    :param deadline:        The time (time.time()) at which the search has to stop, None for no limit
+    :param table_size_mb:   The size of the transposition table in each worker process
+    :param settings:        The depth and time budget of the whole root search (See _worker_context())
+    :param search_id:       The root search that the tasks belong to
+    :return: The result of every move that was searched, in the order of :move_set: (See _search_move()), the
+             moves after one that ran out of time aren't searched
+    """
+    def submit(column: int, alpha: float) -> Future:
+        return pool.submit(_search_move, board, column, depth, alpha, deadline, table_size_mb, settings, search_id)
+
+    results = {move_set[0]: submit(move_set[0], -inf).result()}
+    alpha, columns, running = results[move_set[0]][0], iter(move_set[1:]), set()
+    while alpha is not None or running:
+        while alpha is not None and len(running) < workers:
+            column = next(columns, None)
+            if column is None:
+                break
+            running.add(submit(column, alpha))
+        if not running:
+            break
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            score, column, stats = future.result()
+            results[column] = score, column, stats
+            if score is None:  # Out of time, the moves that weren't submitted yet are skipped
+                alpha = None
+            elif alpha is not None:
+                alpha = max(alpha, score)
+    return [results[column] for column in move_set if column in results]
+
+
+def _deepen(pool: ProcessPoolExecutor, workers: int, board: BitBoard, move_set: List[int], max_depth: Union[int, None],
+            deadline: float, table_size_mb: float, settings: Tuple[Union[int, None], Union[float, None]],
+            search_id: Tuple[int, int]) -> SearchStats:
+    """
+    Searches :board: with _split_search() one ply deeper at a time until :deadline: passes, the first iteration is
+    always completed (See ai.iterative_deepening())
+    :param max_depth:   The deepest iteration to search, None to search up to the end of the game
+    :return: The combined statistics of every iteration, with the result of the deepest completed one
+    (See _split_search() for the other parameters)
+    """
+    remaining = board.rows * board.cols - board.moves
+    max_depth = min(remaining, MAX_DEPTH) if max_depth is None else min(max_depth, remaining)
+    searched: List[SearchStats] = []
+    best: Union[SearchStats, None] = None
+    iterations: List[Tuple[int, float, int]] = []
+    for iteration in range(1, max_depth + 1):
+        iteration_start = perf_counter()
+        results = _split_search(pool, workers, board, move_set, iteration, None if iteration == 1 else deadline,
+                                table_size_mb, settings, search_id)
+        searched.extend(result[2] for result in results)
+        if len(results) < len(move_set) or any(result[0] is None for result in results):
+            break  # The iteration ran out of time
+        best = SearchStats.merge(result[2] for result in results)
+        iterations.append((iteration, perf_counter() - iteration_start, best.nodes))
+        move_set.remove(best.move)  # Search the previous iteration's best move first
+        move_set.insert(0, best.move)
+        if abs(best.score) >= MAX_SCORE - board.rows * board.cols or time() >= deadline:
+            break  # The game's result is known or there is no time left for another iteration
+    stats = SearchStats.merge(searched, best)
+    stats.iterations = iterations
+    return stats
+
+
+def parallel_search(board: BitBoard, move_set: Iterable[int], depth: int, workers: int = None,
+                    time_budget: float = None, table_size_mb: float = 16) -> Tuple[float, int, SearchStats]:
+    """
+    Scores the moves of :board: in parallel (See _split_search()), the moves are solved exactly instead (All at
+    once, with full windows) if :depth: reaches the end of the game and every position after them can be solved
+    :param board:           The position to search
+    :param move_set:        The columns to search from this position
+    :param depth:           The maximum search depth (in plies), None for no limit (Only with a time budget)
+    :param workers:         The number of worker processes, defaults to the number of CPUs
+    :param time_budget:     The number of seconds the search may take, if given the search deepens one ply at a time
+                            (Up to :depth:) until the time runs out, the first iteration is always completed
+    :param table_size_mb:   The size of the transposition table in each worker process
+    :return: The best score, the column that achieved it (-1 if :move_set: is empty) and the combined statistics
+             of every worker's search
+    """
+    start, workers = perf_counter(), workers or os.cpu_count() or 1
+    pool, search_id = get_pool(workers), (os.getpid(), next(_search_ids))
+    move_set = order_moves(board, move_set, SearchContext())  # Ties are broken in favour of central columns
+    if not move_set:
+        return -inf, -1, SearchStats()
+    remaining = board.rows * board.cols - board.moves
+    if depth is not None and depth >= min(remaining, MAX_DEPTH) and remaining - 1 > SOLVER_MAX_EMPTY:
+        depth = SOLVER_FALLBACK_DEPTH  # As solver.search() does for positions that can't be solved
+    settings = depth, time_budget
+    deadline = None if time_budget is None else time() + time_budget
+    if depth is not None and depth >= min(remaining, MAX_DEPTH):
+        futures = [pool.submit(_search_move, board, column, depth, -inf, deadline, table_size_mb, settings,
+                               search_id, True) for column in move_set]
+        stats = SearchStats.merge(future.result()[2] for future in futures)
+    elif time_budget is None:
+        stats = SearchStats.merge(result[2] for result in _split_search(pool, workers, board, move_set, depth, None,
+                                                                        table_size_mb, settings, search_id))
+    else:
+        stats = _deepen(pool, workers, board, move_set, depth, deadline, table_size_mb, settings, search_id)
+    stats.seconds = perf_counter() - start
+    return stats.score, stats.move, stats
@@ -6,7 +6,7 @@ This module contains the implementation of the Player class
 """
 from typing import Any
 
-from src.constants import NUM_OF_PLAYERS
+from src.constants import ENGINES, NUM_OF_PLAYERS
 
 __version__ = '0.1'
 __author__ = 'Eric G.D'
@@ -21,14 +21,18 @@ class Player:
     * The player's id
     * Player type (Human or Computer)
     * The color of the player's tokens
+    * The search algorithm the computer uses for the player's moves (See ENGINES)
     """
 
-    def __init__(self, id_: int, color: str, is_human: bool = True):
+    def __init__(self, id_: int, color: str, is_human: bool = True, engine: str = ENGINES[0]):
         if not 1 <= id_ <= NUM_OF_PLAYERS:
             raise ValueError(f'Player id ({id_}) has to be between 1 and {NUM_OF_PLAYERS}!')
+        if engine not in ENGINES:
+            raise ValueError(f"'{engine}' is not an engine ({', '.join(ENGINES)})!")
         self.__id: int = id_
         self.__color: str = color
         self.__is_human: bool = is_human
+        self.__engine: str = engine
         self.__score: int = 0
 
     @property
@@ -43,6 +47,10 @@ class Player:
     def is_human(self) -> bool:
         return self.__is_human
 
+    @property
+    def engine(self) -> str:
+        return self.__engine
+
     @property
     def score(self) -> int:
         return self.__score
@@ -57,7 +65,7 @@ class Player:
         return f'{self.__color.title()} Player'
 
     def __repr__(self) -> str:
-        return f'Player({self.__id}, {self.__color}, {self.__is_human})'
+        return f'Player({self.__id}, {self.__color}, {self.__is_human}, {self.__engine})'
 
     def __eq__(self, other: Any) -> bool:
         return isinstance(other, Player) and self.__id == other.__id
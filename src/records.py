@@ -0,0 +1,242 @@
+"""
+Module records.py
+=================
+
+This module contains the game record store: finished games are appended to a binary data file, and a small index
+file next to it holds the offset, result and length of every game so single games can be loaded and whole stores
+scanned without parsing them.
+
+The data file is a header followed by a record per game:
+* The time the game started, the board's geometry, the winner (-1 for a draw) and the number of moves
+* Each player's color, type and engine settings (The engine, its search depth or number of playouts per move and
+  its time budget per move, 0 if there is none)
+* The column of every move (One byte each) and the number of seconds each move took (A float each)
+The index file is a header followed by an entry per game, the id of a game is the position of its entry.
+"""
+import mmap
+import struct
+from array import array
+from pathlib import Path
+from time import time
+from typing import Iterator, List, Sequence, Tuple, Union
+
+from src.constants import ENGINES, TOKEN_COLORS
+from src.game import Game
+
+__all__ = ['GameRecord', 'RecordStore', 'append_record', 'index_path']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+DATA_MAGIC: bytes = b'C4GR'
+INDEX_MAGIC: bytes = b'C4GI'
+FORMAT_VERSION: int = 2  # Version 2 added the players' engines
+HEADER: struct.Struct = struct.Struct('<4sB3x')  # Magic, version (Both files)
+RECORD: struct.Struct = struct.Struct('<dBBBbH')  # Start time, rows, cols, length, winner, number of moves
+PLAYER: struct.Struct = struct.Struct('<BBBIf')  # Color index, is human, engine index, search limit, time budget
+INDEX: struct.Struct = struct.Struct('<QIHbx')  # Offset of the record, size of the record, number of moves, winner
+
+PlayerEntry = Tuple[str, bool, str, int, Union[float, None]]  # Color, is human, engine, search limit, time budget
+
+
+def index_path(path: Path) -> Path:
+    """
+    :param path:    The path of a record store's data file
+    :return: The path of its index file
+    """
+    return path.with_suffix('.idx')
+
+
+class GameRecord:
+    """
+    class GameRecord:
+    -----------------
+
+    A finished game: its geometry, players, moves, the time each move took and the result
+    """
+
+    def __init__(self, rows: int, cols: int, length: int, players: Sequence[PlayerEntry], moves: Sequence[int],
+                 think_times: Sequence[float], winner: Union[int, None], started: float = None):
+        if len(moves) != len(think_times):
+            raise ValueError(f'There are {len(moves)} moves but {len(think_times)} think times!')
+        self.rows: int = rows
+        self.cols: int = cols
+        self.length: int = length
+        self.players: Tuple[PlayerEntry, ...] = tuple(players)
+        self.moves: List[int] = list(moves)
+        self.think_times: List[float] = list(think_times)
+        self.winner: Union[int, None] = winner  # The index of the player that won, None for a draw
+        self.started: float = time() if started is None else started  # time.time() when the game started
+
+    def __repr__(self) -> str:
+        return (f'GameRecord({self.rows}, {self.cols}, {self.length}, moves={self.moves!r}, '
+                f'winner={self.winner!r})')
+
+    @staticmethod
+    def from_game(game: Game, players: Sequence[PlayerEntry], think_times: Sequence[float],
+                  started: float = None) -> 'GameRecord':
+        """
+        :param game:        A finished game
+        :param players:     The color, type and engine settings of each player
+        :param think_times: The number of seconds each move took
+        :param started:     The time (time.time()) the game started
+        :return: The record of :game:
+        """
+        winning_color = game.get_winning_player()
+        winner = next((index for index, player in enumerate(players) if player[0] == winning_color), None)
+        return GameRecord(game.rows, game.cols, game.length, players, game.moves, think_times, winner, started)
+
+    def pack(self) -> bytes:
+        """
+        :return: The record as it's stored in the data file
+        """
+        if self.cols > 0x100:
+            raise ValueError(f'Game records only support boards with up to 256 columns, {self.cols} is too many!')
+        return b''.join((
+            RECORD.pack(self.started, self.rows, self.cols, self.length, -1 if self.winner is None else self.winner,
+                        len(self.moves)),
+            *(PLAYER.pack(TOKEN_COLORS.index(color), is_human, ENGINES.index(engine), limit, time_budget or 0.0)
+              for color, is_human, engine, limit, time_budget in self.players),
+            bytes(self.moves),
+            array('f', self.think_times).tobytes()
+        ))
+
+    @staticmethod
+    def unpack(buffer: Union[bytes, memoryview, mmap.mmap], offset: int = 0) -> 'GameRecord':
+        """
+        :param buffer:  A buffer that contains a packed record
+        :param offset:  The position of the record in :buffer:
+        :return: The record
+        """
+        started, rows, cols, length, winner, count = RECORD.unpack_from(buffer, offset)
+        offset += RECORD.size
+        players = []
+        for _ in range(2):
+            color, is_human, engine, limit, time_budget = PLAYER.unpack_from(buffer, offset)
+            players.append((TOKEN_COLORS[color], bool(is_human), ENGINES[engine], limit, time_budget or None))
+            offset += PLAYER.size
+        moves = list(buffer[offset:offset + count])
+        think_times = array('f')
+        think_times.frombytes(buffer[offset + count:offset + 5 * count])
+        return GameRecord(rows, cols, length, players, moves, think_times.tolist(), None if winner == -1 else winner,
+                          started)
+
+
+def _check_header(path: Path, magic: bytes) -> None:
+    """
+    Writes the header of a new (or empty) store file, or checks the header of an existing one
+    :param path:    The path of the file
+    :param magic:   The file's magic number
+    :return: None
+    :raises ValueError: If the file isn't a store file of the current version
+    """
+    if not path.is_file() or not path.stat().st_size:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(HEADER.pack(magic, FORMAT_VERSION))
+    else:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) != HEADER.size or HEADER.unpack(header) != (magic, FORMAT_VERSION):
+            raise ValueError(f"'{path}' is not a version {FORMAT_VERSION} game record file!")
+
+
+def append_record(path: Path, record: GameRecord) -> int:
+    """
+    Appends :record: to a record store, creating the store if it doesn't exist.
+    The record is written before its index entry, so a store that was interrupted while writing never has an entry
+    for a record that isn't there.
+    :param path:    The path of the store's data file
+    :param record:  The game to append
+    :return: The id of the game in the store
+    """
+    data = record.pack()
+    _check_header(path, DATA_MAGIC)
+    _check_header(index_path(path), INDEX_MAGIC)
+    with open(path, 'ab') as f:
+        offset = f.tell()
+        f.write(data)
+    with open(index_path(path), 'r+b') as f:
+        game_id = (f.seek(0, 2) - HEADER.size) // INDEX.size
+        f.seek(HEADER.size + game_id * INDEX.size)  # Overwrites an entry that was only partly written
+        f.write(INDEX.pack(offset, len(data), len(record.moves), -1 if record.winner is None else record.winner))
+        f.truncate()
+    return game_id
+
+
+class RecordStore:
+    """
+    class RecordStore:
+    ------------------
+
+    A read-only view of a record store created by append_record().
+    Both files are memory-mapped: games are only unpacked when they're loaded, and scanning the index (See
+    entries()) never touches the data file. Games appended after the store was opened aren't visible through it.
+    """
+
+    def __init__(self, path: Path):
+        self.__files, self.__maps = [], []
+        try:
+            for file_path, magic in ((path, DATA_MAGIC), (index_path(path), INDEX_MAGIC)):
+                f = open(file_path, 'rb')
+                self.__files.append(f)
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.__maps.append(data)
+                if len(data) < HEADER.size or HEADER.unpack_from(data) != (magic, FORMAT_VERSION):
+                    raise ValueError(f"'{file_path}' is not a version {FORMAT_VERSION} game record file!")
+        except (OSError, ValueError):
+            self.close()
+            raise
+        self.__data, self.__index = self.__maps
+        self.__count: int = (len(self.__index) - HEADER.size) // INDEX.size
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __enter__(self) -> 'RecordStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __getitem__(self, game_id: int) -> GameRecord:
+        offset, *_ = self.entry(game_id)
+        return GameRecord.unpack(self.__data, offset)
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        return (GameRecord.unpack(self.__data, offset) for offset, *_ in self.__entries())
+
+    def close(self) -> None:
+        """
+        Closes the store's files
+        :return: None
+        """
+        for data in self.__maps:
+            data.close()
+        for f in self.__files:
+            f.close()
+        self.__maps, self.__files = [], []
+
+    def entry(self, game_id: int) -> Tuple[int, int, int, int]:
+        """
+        :param game_id: The id of a game
+        :return: The offset and size of the game's record, its number of moves and its winner (-1 for a draw)
+        :raises IndexError: If there is no such game
+        """
+        if not 0 <= game_id < self.__count:
+            raise IndexError(f'There is no game {game_id} (The store has {self.__count} games)!')
+        return INDEX.unpack_from(self.__index, HEADER.size + game_id * INDEX.size)
+
+    def __entries(self, block: int = 0x1000) -> Iterator[Tuple[int, int, int, int]]:
+        """
+        :param block:   The number of entries read from the index at once
+        :return: Every entry of the index (See entry())
+        """
+        end = HEADER.size + self.__count * INDEX.size
+        for start in range(HEADER.size, end, block * INDEX.size):
+            yield from INDEX.iter_unpack(self.__index[start:min(end, start + block * INDEX.size)])
+
+    def entries(self) -> Iterator[Tuple[int, int, Union[int, None]]]:
+        """
+        :return: The id, number of moves and winner (None for a draw) of every game, read from the index alone
+        """
+        return ((game_id, moves, None if winner == -1 else winner)
+                for game_id, (_, _, moves, winner) in enumerate(self.__entries()))
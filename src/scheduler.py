@@ -0,0 +1,97 @@
+"""
+Module scheduler.py
+===================
+
+This module contains the implementation of the FrameScheduler class, which drives the game's asyncio tasks at a
+fixed framerate
+"""
+import asyncio
+from typing import Callable, List, Union
+
+from src.constants import FPS
+
+__all__ = ['FrameScheduler']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+class FrameScheduler:
+    """
+    class FrameScheduler:
+    ---------------------
+
+    Runs every renderer once per frame and wakes up the tasks waiting for the next frame (See next_frame()), then
+    sleeps for the rest of the frame's budget so the event loop can run other tasks (Input, AI searches) in between.
+    Frames that run over budget are not made up for.
+    """
+
+    def __init__(self, fps: int = FPS):
+        self.fps: int = fps
+        self.frame: int = 0
+        self.__renderers: List[Callable[[], None]] = []
+        self.__next_frame: Union[asyncio.Future, None] = None
+        self.__running: bool = False
+
+    @property
+    def frame_budget(self) -> float:
+        """
+        :return: The number of seconds in a frame
+        """
+        return 1 / self.fps
+
+    @property
+    def is_running(self) -> bool:
+        return self.__running
+
+    def add_renderer(self, renderer: Callable[[], None]) -> None:
+        """
+        :param renderer:    A function that draws a frame, called once per frame in the order the renderers were added
+        :return: None
+        """
+        self.__renderers.append(renderer)
+
+    def remove_renderer(self, renderer: Callable[[], None]) -> None:
+        """
+        :param renderer:    A function added by add_renderer()
+        :return: None
+        """
+        self.__renderers.remove(renderer)
+
+    def __future(self) -> asyncio.Future:
+        if self.__next_frame is None:
+            self.__next_frame = asyncio.get_running_loop().create_future()
+        return self.__next_frame
+
+    async def next_frame(self) -> int:
+        """
+        Waits until the next frame has been rendered
+        :return: The number of the frame
+        """
+        return await asyncio.shield(self.__future())  # A cancelled waiter mustn't cancel the frame for the others
+
+    async def run(self) -> None:
+        """
+        Renders frames until stop() is called
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        self.__running = True
+        deadline = loop.time()
+        while self.__running:
+            for renderer in tuple(self.__renderers):
+                renderer()
+            self.frame += 1
+            future, self.__next_frame = self.__future(), None
+            future.set_result(self.frame)
+            deadline += self.frame_budget
+            delay = deadline - loop.time()
+            if delay < 0:
+                deadline, delay = loop.time(), 0
+            await asyncio.sleep(delay)
+
+    def stop(self) -> None:
+        """
+        Makes run() return after the current frame
+        :return: None
+        """
+        self.__running = False
@@ -0,0 +1,511 @@
+"""
+Module server.py
+================
+
+This module contains the implementation of the GameServer class, which hosts many headless games at once over a local
+socket and runs their engine moves in the shared process pool.
+
+The protocol is newline-delimited JSON: every request is an object with an 'op', an optional 'id' (Copied into the
+reply so requests can be pipelined) and the op's parameters, and every reply has 'ok' and either the result or an
+'error':
+* new:      rows, cols, length (Up to SERVER_MAX_SIDE), players (e.g. ['human', 'engine']), engine (An engine name,
+            or one per player, e.g. ['alphabeta', 'mcts']), depth, move_time, time_limit -> A game's state
+* move:     game, column -> Plays a human move, then the engine's replies until it's a human's turn again
+* play:     game, limit -> Plays up to :limit: engine moves (All of them if it's not given, runs engine-only games)
+* state:    game -> The game's state
+* close:    game -> Forgets the game
+* stats:    The number of games, the pool's load and the latency percentiles of every op and of the searches
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Set, Union
+
+from src.constants import COLS, ENGINES, LATENCY_WINDOW, ROWS, SERVER_HOST, SERVER_MAX_GAMES, SERVER_MAX_INFLIGHT, \
+    SERVER_MAX_SIDE, SERVER_PORT, WIN_LENGTH
+from src.game import Game
+from src.mcts import mcts_position
+from src.parallel import get_pool, search_position
+from src.player import Player
+
+__all__ = ['LatencyTracker', 'ServerGame', 'GameServer']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+Reply = Dict[str, Any]
+
+
+class LatencyTracker:
+    """
+    class LatencyTracker:
+    ---------------------
+
+    Keeps the most recent durations of an operation and reports their percentiles
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        """
+        :param window:  The number of recent samples to keep
+        """
+        self.__samples: Deque[float] = deque(maxlen=window)
+        self.count: int = 0  # Every sample ever added, not just the ones in the window
+
+    def __len__(self) -> int:
+        return len(self.__samples)
+
+    def add(self, seconds: float) -> None:
+        """
+        :param seconds: The duration of a single operation
+        :return: None
+        """
+        self.__samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, percent: float) -> float:
+        """
+        :param percent: A percentage between 0 and 100
+        :return: The smallest sample that is at least as large as :percent:% of the samples (0 if there are none)
+        """
+        if not self.__samples:
+            return 0.0
+        samples = sorted(self.__samples)
+        return samples[max(0, min(len(samples) - 1, -int(-percent * len(samples) // 100) - 1))]
+
+    def summary(self) -> Dict[str, Union[int, float]]:
+        """
+        :return: The number of samples and their median, 90th, 99th percentile and maximum in milliseconds
+        """
+        return {
+            'count': self.count,
+            **{name: round(1000 * self.percentile(percent), 3)
+               for name, percent in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))}
+        }
+
+
+class ServerGame:
+    """
+    class ServerGame:
+    -----------------
+
+    A game hosted by GameServer, with its engine settings and the players' clocks.
+    Each player has :time_limit: seconds for the whole game (Humans are timed from the moment it became their turn
+    until their move arrives, engines from the moment their move was requested until the search finished), a player
+    whose clock runs out loses.
+    """
+
+    def __init__(self, id_: str, game: Game, engines: List[bool], depth: str = None, move_time: float = None,
+                 time_limit: float = None):
+        self.id: str = id_
+        self.game: Game = game
+        self.engines: List[bool] = engines  # Whether each player is an engine
+        self.depth: Union[str, None] = depth
+        self.move_time: Union[float, None] = move_time
+        self.clocks: Union[List[float], None] = None if time_limit is None else [time_limit, time_limit]
+        self.turn_start: float = perf_counter()
+        self.winner: Union[int, None] = None  # The index of the player that won
+        self.reason: Union[str, None] = None  # How the game ended: 'connect', 'draw' or 'time'
+        self.lock: asyncio.Lock = asyncio.Lock()  # Requests on the same game run one at a time
+
+    @property
+    def player(self) -> int:
+        """
+        :return: The index of the player to move
+        """
+        return len(self.game.moves) % 2
+
+    @property
+    def is_over(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self, player: int) -> Union[float, None]:
+        """
+        :param player:  The index of a player
+        :return: The number of seconds left on :player:'s clock, counting the current turn, None if it's not timed
+        """
+        if self.clocks is None:
+            return None
+        elapsed = perf_counter() - self.turn_start if player == self.player and not self.is_over else 0.0
+        return self.clocks[player] - elapsed
+
+    def check_clock(self) -> bool:
+        """
+        Ends the game if the player to move has run out of time
+        :return: True if the game is over, False otherwise
+        """
+        if not self.is_over:
+            remaining = self.remaining(self.player)
+            if remaining is not None and remaining <= 0:
+                self.time_out()
+        return self.is_over
+
+    def time_out(self) -> None:
+        """
+        Ends the game with a loss on time for the player to move
+        :return: None
+        """
+        self.clocks[self.player], self.winner, self.reason = 0.0, 1 - self.player, 'time'
+
+    def move_budget(self) -> Union[float, None]:
+        """
+        :return: The number of seconds the engine to move may search: :move_time:, capped by its remaining time
+                 shared between its remaining moves, None if neither limits it
+        """
+        remaining = self.remaining(self.player)
+        if remaining is None:
+            return self.move_time
+        share = remaining / max(1, (self.game.tile_num - len(self.game.moves) + 1) // 2)
+        return share if self.move_time is None else min(self.move_time, share)
+
+    def play(self, column: int) -> None:
+        """
+        Plays :column: for the player to move and stops their clock
+        :param column:  The index of the column
+        :return: None
+        :raises ValueError: If :column: can't be played
+        """
+        player = self.player
+        self.game.insert(column, self.game.get_current_player().color)
+        now = perf_counter()
+        if self.clocks is not None:
+            self.clocks[player] -= now - self.turn_start
+        self.turn_start = now
+        if self.game.get_winning_player() is not None:
+            self.winner, self.reason = player, 'connect'
+        elif self.game.is_full():
+            self.reason = 'draw'
+
+    def state(self) -> Reply:
+        """
+        :return: The game's state, as sent to clients
+        """
+        return {
+            'game': self.id,
+            'rows': self.game.rows,
+            'cols': self.game.cols,
+            'length': self.game.length,
+            'moves': list(self.game.moves),
+            'turn': None if self.is_over else self.player,
+            'legal': [] if self.is_over else
+            [column for column in range(self.game.cols) if not self.game.column_full(column)],
+            'engines': self.engines,
+            'winner': self.winner,
+            'reason': self.reason,
+            'clocks': None if self.clocks is None else [round(self.remaining(player), 3) for player in range(2)]
+        }
+
+
+class GameServer:
+    """
+    class GameServer:
+    -----------------
+
+    Hosts games for clients on a local socket (See the module's docstring for the protocol).
+    Engine moves are searched in the shared process pool, at most :max_pending: at a time: other searches wait for a
+    slot, and each connection only reads its next request while it has fewer than :max_inflight: requests running,
+    so a client that sends requests faster than the pool can answer them is slowed down by TCP instead of queueing
+    unbounded work in the server.
+    """
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = None, max_pending: int = None,
+                 max_games: int = SERVER_MAX_GAMES, max_inflight: int = SERVER_MAX_INFLIGHT):
+        """
+        :param host:            The address to listen on
+        :param port:            The port to listen on, 0 picks a free port (See GameServer.port)
+        :param workers:         The number of worker processes, defaults to the number of CPUs
+        :param max_pending:     The number of searches submitted to the pool at once, defaults to twice the number
+                                of workers (So a worker never waits for the server between searches)
+        :param max_games:       The number of games kept at once, new games are refused after that
+        :param max_inflight:    The number of requests of a single connection that run at once
+        """
+        self.host: str = host
+        self.port: int = port
+        self.max_games: int = max_games
+        self.max_inflight: int = max_inflight
+        workers = workers or os.cpu_count() or 1
+        self.__pool: ProcessPoolExecutor = get_pool(workers)
+        self.__max_pending: int = max_pending or 2 * workers
+        self.__slots: Union[asyncio.Semaphore, None] = None  # Created in the server's event loop
+        self.__pending: int = 0  # Searches waiting for a slot or running
+        self.__games: Dict[str, ServerGame] = {}
+        self.__ids = count(1)
+        self.__server: Union[asyncio.AbstractServer, None] = None
+        self.__connections: Dict[asyncio.StreamReader, asyncio.Task] = {}  # Reader -> The task serving it
+        self.__latencies: Dict[str, LatencyTracker] = {}
+        self.__ops: Dict[str, Callable[[Reply], Awaitable[Reply]]] = {
+            'new': self.__new,
+            'move': self.__move,
+            'play': self.__play,
+            'state': self.__state,
+            'close': self.__close,
+            'stats': self.__stats
+        }
+
+    @property
+    def games(self) -> int:
+        return len(self.__games)
+
+    def latency(self, name: str) -> LatencyTracker:
+        """
+        :param name:    An op, 'search' (Searches, including the wait for a pool slot) or 'queue' (The wait alone)
+        :return: The latency tracker of :name:
+        """
+        tracker = self.__latencies.get(name)
+        if tracker is None:
+            tracker = self.__latencies[name] = LatencyTracker()
+        return tracker
+
+    async def start(self) -> None:
+        """
+        Starts listening, GameServer.port is the actual port once this returns
+        :return: None
+        """
+        self.__slots = asyncio.Semaphore(self.__max_pending)
+        self.__server = await asyncio.start_server(self.__handle, self.host, self.port)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        logging.info(f'Game server listening on {self.host}:{self.port}')
+
+    async def serve_forever(self) -> None:
+        """
+        Starts the server if it wasn't started and serves clients until the task is cancelled
+        :return: None
+        """
+        if self.__server is None:
+            await self.start()
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    async def close(self) -> None:
+        """
+        Stops accepting connections and closes the open ones, requests that are still running are cancelled
+        (The shared process pool is left running, see parallel.shutdown_pool())
+        :return: None
+        """
+        if self.__server is not None:
+            self.__server.close()
+            for reader in self.__connections:
+                reader.feed_eof()  # Each connection's task stops as if the client had disconnected
+            await asyncio.gather(*self.__connections.values(), return_exceptions=True)
+            await self.__server.wait_closed()
+            self.__server = None
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves a single connection, each request runs in its own task so a client can pipeline requests
+        :param reader:  The connection's reader
+        :param writer:  The connection's writer
+        :return: None
+        """
+        self.__connections[reader] = asyncio.current_task()
+        inflight = asyncio.Semaphore(self.max_inflight)
+        write_lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+
+        async def respond(line: bytes) -> None:
+            try:
+                reply = await self.handle_request(line)
+                async with write_lock:
+                    writer.write(json.dumps(reply).encode() + b'\n')
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                inflight.release()
+
+        try:
+            while True:
+                await inflight.acquire()  # Stop reading while the connection has too many requests running
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):  # ValueError: The line is longer than the reader's limit
+                    line = b''
+                if not line:
+                    inflight.release()
+                    break
+                task = asyncio.ensure_future(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+            del self.__connections[reader]
+
+    async def handle_request(self, line: Union[bytes, str]) -> Reply:
+        """
+        :param line:    A single request, as JSON
+        :return: The reply to the request
+        """
+        start = perf_counter()
+        request_id, op = None, None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('A request has to be a JSON object!')
+            request_id, op = request.get('id'), request.get('op')
+            handler = self.__ops.get(op)
+            if handler is None:
+                raise ValueError(f"'{op}' is not an op ({', '.join(self.__ops)})!")
+            reply = {'ok': True, **await handler(request)}
+        except (ValueError, KeyError, TypeError) as e:
+            reply = {'ok': False, 'error': str(e) if not isinstance(e, KeyError) else f'Missing parameter {e}!'}
+        except Exception as e:  # Anything else still gets a reply, or a pipelining client would wait for it forever
+            logging.exception(f"Request {request_id!r} ('{op}') failed")
+            reply = {'ok': False, 'error': str(e) or type(e).__name__}
+        if request_id is not None:
+            reply['id'] = request_id
+        if op in self.__ops:
+            self.latency(op).add(perf_counter() - start)
+        return reply
+
+    def __get_game(self, request: Reply) -> ServerGame:
+        """
+        :param request: A request with a game id
+        :return: The game
+        :raises ValueError: If there's no such game
+        """
+        game = self.__games.get(str(request['game']))
+        if game is None:
+            raise ValueError(f"There is no game '{request['game']}'!")
+        return game
+
+    async def __new(self, request: Reply) -> Reply:
+        if len(self.__games) >= self.max_games:
+            raise ValueError(f'The server already has {self.max_games} games, close some first!')
+        kinds = request.get('players', ['human', 'engine'])
+        if len(kinds) != 2 or not set(kinds) <= {'human', 'engine'}:
+            raise ValueError("players has to be a pair of 'human' or 'engine'!")
+        depth = request.get('depth')
+        if depth is not None and depth not in Game.difficulty:
+            raise ValueError(f"'{depth}' is not a difficulty level ({', '.join(Game.difficulty)})!")
+        move_time, time_limit = request.get('move_time'), request.get('time_limit')
+        for name, value in (('move_time', move_time), ('time_limit', time_limit)):
+            if value is not None and not (isinstance(value, (int, float)) and value > 0):
+                raise ValueError(f'{name} has to be a positive number of seconds!')
+        algorithms = request.get('engine', ENGINES[0])
+        algorithms = [algorithms] * 2 if isinstance(algorithms, str) else algorithms
+        if not isinstance(algorithms, list) or len(algorithms) != 2 or not set(algorithms) <= set(ENGINES):
+            raise ValueError(f"engine has to be one of {', '.join(ENGINES)} or a pair of them!")
+        geometry = [request.get(name, default) for name, default in (('rows', ROWS), ('cols', COLS),
+                                                                        ('length', WIN_LENGTH))]
+        if not all(isinstance(value, int) and 2 <= value <= SERVER_MAX_SIDE for value in geometry):
+            raise ValueError(f'rows, cols and length have to be integers between 2 and {SERVER_MAX_SIDE}!')
+        rows, cols, length = geometry
+        if length > min(rows, cols):
+            raise ValueError(f'A {rows}x{cols} board is too small to connect {length}!')
+        engines = [kind == 'engine' for kind in kinds]
+        players = Player(1, 'red', not engines[0], algorithms[0]), Player(2, 'yellow', not engines[1], algorithms[1])
+        game = Game(rows, cols, players, length)
+        id_ = str(next(self.__ids))
+        self.__games[id_] = entry = ServerGame(id_, game, engines, depth, move_time, time_limit)
+        return entry.state()
+
+    async def __move(self, request: Reply) -> Reply:
+        entry = self.__get_game(request)
+        async with entry.lock:
+            if entry.check_clock():
+                raise ValueError(f'Game {entry.id} is over!')
+            if entry.engines[entry.player]:
+                raise ValueError(f"It's the engine's turn in game {entry.id}!")
+            column = request['column']
+            if not isinstance(column, int):
+                raise ValueError('column has to be an integer!')
+            entry.play(column)
+            return {**entry.state(), 'played': await self.__play_engines(entry)}
+
+    async def __play(self, request: Reply) -> Reply:
+        entry = self.__get_game(request)
+        async with entry.lock:
+            limit = request.get('limit')
+            played = await self.__play_engines(entry, None if limit is None else int(limit))
+            return {**entry.state(), 'played': played}
+
+    async def __state(self, request: Reply) -> Reply:
+        entry = self.__get_game(request)
+        entry.check_clock()
+        return entry.state()
+
+    async def __close(self, request: Reply) -> Reply:
+        entry = self.__get_game(request)
+        del self.__games[entry.id]
+        return {'game': entry.id}
+
+    async def __stats(self, request: Reply) -> Reply:
+        return {
+            'games': len(self.__games),
+            'pending': self.__pending,
+            'max_pending': self.__max_pending,
+            'latency': {name: tracker.summary() for name, tracker in sorted(self.__latencies.items())}
+        }
+
+    async def __play_engines(self, entry: ServerGame, limit: int = None) -> List[Dict[str, Any]]:
+        """
+        Plays engine moves until it's a human's turn, the game is over or :limit: moves were played
+        :param entry:   A game whose lock is held
+        :param limit:   The maximum number of moves to play, None for no limit
+        :return: The column, nodes and search time of every move that was played
+        """
+        played = []
+        while (limit is None or len(played) < limit) and not entry.check_clock() and entry.engines[entry.player]:
+            played.append(await self.__engine_move(entry))
+        return played
+
+    async def __engine_move(self, entry: ServerGame) -> Dict[str, Any]:
+        """
+        Searches the position of :entry: in the process pool and plays the result, or ends the game if the engine ran
+        out of time first
+        :param entry:   A game whose lock is held, on an engine's turn
+        :return: The column, nodes and search time of the move (The column is -1 if the engine ran out of time)
+        """
+        start = perf_counter()
+        column, nodes = entry.game.book_move(), 0
+        if column == -1:
+            budget = entry.move_budget()
+            limits = Game.playouts if entry.game.get_current_player().engine == 'mcts' else Game.difficulty
+            depth = limits.get(entry.depth, None if budget is not None else limits['medium'])
+            try:
+                column, nodes = await asyncio.wait_for(self.__search(entry, depth, budget),
+                                                       entry.remaining(entry.player))
+            except asyncio.TimeoutError:
+                entry.time_out()
+                return {'column': -1, 'nodes': 0, 'seconds': round(perf_counter() - start, 6)}
+        entry.play(column)
+        return {'column': column, 'nodes': nodes, 'seconds': round(perf_counter() - start, 6)}
+
+    async def __search(self, entry: ServerGame, depth: Union[int, None], budget: Union[float, None]) -> Any:
+        """
+        Waits for a free slot in the pool and searches the position of :entry:.
+        The slot is only given back once the worker is done with the search, so a search that was abandoned (Because
+        the engine ran out of time) still counts against :max_pending: until it stops, and one that hadn't started
+        yet is removed from the pool's queue.
+        :param entry:   A game, on an engine's turn
+        :param depth:   The maximum search depth (The number of playouts for the 'mcts' engine)
+        :param budget:  The number of seconds the search may take
+        :return: The best column and the number of nodes searched
+        """
+        start, loop = perf_counter(), asyncio.get_running_loop()
+        self.__pending += 1
+        try:
+            await self.__slots.acquire()
+        except asyncio.CancelledError:
+            self.__pending -= 1
+            raise
+
+        def release(_) -> None:
+            self.__pending -= 1
+            self.__slots.release()
+
+        self.latency('queue').add(perf_counter() - start)
+        if entry.game.get_current_player().engine == 'mcts':
+            future = self.__pool.submit(mcts_position, entry.game.convert(), depth, budget)
+        else:
+            future = self.__pool.submit(search_position, entry.game.convert(), depth, budget, Game.table_size_mb)
+        future.add_done_callback(lambda done: loop.call_soon_threadsafe(release, done))
+        _, column, stats, *_ = await asyncio.wrap_future(future)
+        self.latency('search').add(perf_counter() - start)
+        return column, stats.nodes
@@ -0,0 +1,208 @@
+"""
+Module solver.py
+================
+
+This module contains the exact solver used by the 'perfect' difficulty, which searches positions to the end of the
+game with null-window searches instead of stopping at a heuristic depth
+"""
+from functools import lru_cache
+from math import inf
+from time import perf_counter
+from typing import Iterable, List, Tuple, Union
+
+from src.ai import SearchContext, SearchTimeout, alpha_beta, center_distances, has_won, iterative_deepening
+from src.bitboard import BitBoard, column_masks
+from src.constants import MAX_DEPTH, MAX_SCORE, SOLVER_FALLBACK_DEPTH, SOLVER_MAX_EMPTY, SOLVER_TIME_BUDGET, \
+    Geometry
+from src.stats import SearchStats
+from src.transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+__all__ = ['solve', 'search']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+_table: Union[TranspositionTable, None] = None  # Only holds exact results, so it's kept apart from the search's table
+_table_geometry: Union[Geometry, None] = None  # The geometry of the positions in _table (Keys don't include the length)
+
+
+def solver_table(board: BitBoard, size_mb: float = 16) -> TranspositionTable:
+    """
+    :param board:   The position that will be solved, the table is cleared if it held positions of another geometry
+    :param size_mb: The size of the table, used if it doesn't exist yet
+    :return: The current process's solver transposition table
+    """
+    global _table, _table_geometry
+    if _table is None:
+        _table = TranspositionTable(size_mb)
+    if _table_geometry != (board.rows, board.cols, board.length):
+        _table.clear()
+        _table_geometry = (board.rows, board.cols, board.length)
+    _table.new_search()
+    return _table
+
+
+@lru_cache()
+def column_order(rows: int, cols: int) -> Tuple[Tuple[int, int], ...]:
+    """
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :return: Every column and a mask of its cells, central columns first
+    """
+    distances, masks = center_distances(cols), column_masks(rows, cols)
+    return tuple((column, masks[column]) for column in sorted(range(cols), key=lambda column: distances[column]))
+
+
+def _sorted_moves(board: BitBoard, possible: int) -> List[int]:
+    """
+    :param board:       A position
+    :param possible:    A mask of the cells that may be played
+    :return: The columns of :possible:, sorted by the number of winning cells each move gives the player to move
+             (Ties are broken in favour of central columns)
+    """
+    player, scored = board.player, []
+    for column, column_mask in column_order(board.rows, board.cols):
+        if possible & column_mask:
+            board.play(column)
+            scored.append((-bin(board.winning_cells(player)).count('1'), len(scored), column))
+            board.unplay(column)
+    return [column for *_, column in sorted(scored)]
+
+
+def _negamax(board: BitBoard, alpha: int, beta: int, context: SearchContext) -> int:
+    """
+    Scores :board: exactly (A win is worth MAX_SCORE minus the number of moves it took, a draw is worth 0)
+    :param board:   The position to search, moves are played and unplayed in place
+    :param alpha:   The score the player to move is already guaranteed
+    :param beta:    The score the opponent is already guaranteed
+    :param context: The state shared by the whole search
+    :return: The score of :board: if it's between :alpha: and :beta:, otherwise a bound on the score on the same
+             side of the window
+    :raises SearchTimeout: If :context:'s deadline has passed
+    """
+    context.nodes += 1
+    if context.deadline is not None and not context.nodes & 0xFF and perf_counter() >= context.deadline:
+        raise SearchTimeout()
+    moves, cells = board.moves, board.rows * board.cols
+    if board.winning_cells(board.player) & board.possible():
+        return MAX_SCORE - (moves + 1)
+    possible = board.non_losing_moves()
+    if not possible:  # Every move lets the opponent win
+        return -(MAX_SCORE - (moves + 2))
+    if moves + 2 >= cells:
+        return 0
+    lowest = -(MAX_SCORE - (moves + 4)) if moves + 4 <= cells else 0  # The opponent can't win on their next move
+    if alpha < lowest:
+        alpha = lowest
+        if alpha >= beta:
+            return alpha
+    highest = MAX_SCORE - (moves + 3) if moves + 3 <= cells else 0  # The player to move can't win on this move
+    if beta > highest:
+        beta = highest
+        if alpha >= beta:
+            return beta
+    table, key = context.table, board.key()
+    entry = table.get(key)
+    if entry is not None and entry[0] >= cells - moves:  # Only exact results are stored
+        _, flag, score, _ = entry
+        if flag == EXACT:
+            return score
+        if flag == LOWER:
+            alpha = max(alpha, score)
+        else:
+            beta = min(beta, score)
+        if alpha >= beta:
+            return score
+    original_alpha, best_score, best_move = alpha, -inf, -1
+    for i, column in enumerate(_sorted_moves(board, possible)):
+        board.play(column)
+        score = -_negamax(board, -beta, -alpha, context)
+        board.unplay(column)
+        if score > best_score:
+            best_score, best_move = score, column
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            context.add_cutoff(board, column, cells - moves, i == 0)
+            break
+    flag = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+    table.store(key, cells - moves, flag, best_score, best_move)
+    return best_score
+
+
+def solve(board: BitBoard, context: SearchContext = None) -> Tuple[int, int]:
+    """
+    Finds the exact score of :board: with a binary search over every possible result of the game (The wins and
+    losses of each length and a draw), where each step is a null-window search that checks whether the score is
+    above the middle result
+    :param board:   The position to solve
+    :param context: The state shared by the whole search, a solver table is used if it has none
+    :return: The exact score of :board: from the perspective of the player to move, and a column that achieves it
+             (-1 if the game is over)
+    :raises SearchTimeout: If :context:'s deadline has passed
+    """
+    if context is None:
+        context = SearchContext()
+    if context.table is None:
+        context.table = solver_table(board)
+    board = board.copy()
+    board.evaluation = None  # The solver doesn't use the heuristic score
+    moves, cells = board.moves, board.rows * board.cols
+    if has_won(board):
+        return -(MAX_SCORE - moves), -1
+    if board.is_full():
+        return 0, -1
+    wins = board.winning_cells(board.player) & board.possible()
+    if wins:
+        return MAX_SCORE - (moves + 1), next(column for column, column_mask in column_order(board.rows, board.cols)
+                                              if wins & column_mask)
+    results = sorted({0, *(MAX_SCORE - ply for ply in range(moves + 1, cells + 1, 2)),
+                      *(-(MAX_SCORE - ply) for ply in range(moves + 2, cells + 1, 2))})
+    low, high = 0, len(results) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if _negamax(board, results[middle], results[middle] + 1, context) > results[middle]:
+            low = middle + 1
+        else:
+            high = middle
+    score = results[low]
+    for column in _sorted_moves(board, board.possible()):
+        board.play(column)
+        is_best = -_negamax(board, -score, -score + 1, context) >= score
+        board.unplay(column)
+        if is_best:
+            return score, column
+    raise AssertionError(f'No move of\n{board}\nachieves its score ({score})!')
+
+
+def search(board: BitBoard, move_set: Iterable[int], depth: Union[int, None], context: SearchContext,
+           time_budget: float = None, fallback_depth: int = SOLVER_FALLBACK_DEPTH) -> SearchStats:
+    """
+    Searches :board: with iterative_deepening() if :time_budget: is given, or with alpha_beta() otherwise.
+    If :depth: reaches the end of the game the position is solved exactly instead, unless more than SOLVER_MAX_EMPTY
+    cells are still empty or solving runs out of time, then it's searched :fallback_depth: plies deep.
+    :param board:           The position to search
+    :param move_set:        The columns to search from this position (The solver always searches every legal move)
+    :param depth:           The maximum search depth, None for no limit (Only with a time budget, never solves)
+    :param context:         The state shared by the heuristic search
+    :param time_budget:     The number of seconds the search may take, the solver may use half of it
+                            (Or SOLVER_TIME_BUDGET if it isn't given)
+    :param fallback_depth:  The search depth used when the position isn't solved
+    :return: The statistics of the search, including its score and best move
+    """
+    start = perf_counter()
+    remaining = board.rows * board.cols - board.moves
+    if depth is not None and depth >= min(remaining, MAX_DEPTH):  # MAX_DEPTH always searches to the end
+        if remaining <= SOLVER_MAX_EMPTY:
+            solver_context = SearchContext(solver_table(board),
+                                           start + (SOLVER_TIME_BUDGET if time_budget is None else time_budget / 2))
+            try:
+                score, move = solve(board, solver_context)
+                return SearchStats.collect(solver_context, board, score, move, remaining)
+            except SearchTimeout:
+                if time_budget is not None:
+                    time_budget = max(0.0, time_budget - (perf_counter() - start))
+        depth = fallback_depth
+    if time_budget is None:
+        score, move = alpha_beta(board, move_set, -inf, inf, depth, context)
+    else:
+        score, move, depth = iterative_deepening(board, move_set, time_budget, context, depth)
+    return SearchStats.collect(context, board, score, move, depth)
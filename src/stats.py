@@ -0,0 +1,148 @@
+"""
+Module stats.py
+===============
+
+This module contains the implementation of the SearchStats class, a summary of where a search spent its time that
+can be read from Python or written to the log
+"""
+import json
+import logging
+from math import inf
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+from src.ai import SearchContext, principal_variation
+from src.bitboard import BitBoard
+
+__all__ = ['SearchStats']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+class SearchStats:
+    """
+    class SearchStats:
+    ------------------
+
+    The counters of a finished search:
+    * The number of nodes visited and the number of seconds the search took
+    * The number of beta cutoffs, and how many of them were caused by the first move searched
+    * The number of transposition table probes and hits during the search
+    * The depth, duration and number of nodes of each iteration (A single one for fixed-depth searches)
+    * The result of the search: its score, best move, depth and principal variation
+    """
+    __slots__ = ('nodes', 'seconds', 'cutoffs', 'first_move_cutoffs', 'table_probes', 'table_hits', 'iterations',
+                 'score', 'move', 'depth', 'pv')
+
+    def __init__(self):
+        self.nodes: int = 0
+        self.seconds: float = 0.0
+        self.cutoffs: int = 0
+        self.first_move_cutoffs: int = 0
+        self.table_probes: int = 0
+        self.table_hits: int = 0
+        self.iterations: List[Tuple[int, float, int]] = []
+        self.score: float = 0
+        self.move: int = -1
+        self.depth: int = 0
+        self.pv: List[int] = []
+
+    def __repr__(self) -> str:
+        return (f'SearchStats(move={self.move}, score={self.score}, depth={self.depth}, nodes={self.nodes}, '
+                f'nps={self.nodes_per_second:.0f})')
+
+    @staticmethod
+    def collect(context: SearchContext, board: BitBoard, score: float, move: int, depth: int) -> 'SearchStats':
+        """
+        :param context: The context of a finished search
+        :param board:   The position that was searched
+        :param score:   The score returned by the search
+        :param move:    The move returned by the search
+        :param depth:   The depth of the search (Of its deepest completed iteration)
+        :return: The statistics of the search
+        """
+        stats = SearchStats()
+        stats.nodes, stats.seconds = context.nodes, perf_counter() - context.start
+        stats.cutoffs, stats.first_move_cutoffs = context.cutoffs, context.first_move_cutoffs
+        if context.table is not None:
+            stats.table_probes = context.table.probes - context.table_probes
+            stats.table_hits = context.table.hits - context.table_hits
+            stats.pv = principal_variation(board, context.table, depth)
+        stats.iterations = context.iterations[:] or [(depth, stats.seconds, stats.nodes)]
+        stats.score, stats.move, stats.depth = score, move, depth
+        if not stats.pv and move != -1:
+            stats.pv = [move]
+        return stats
+
+    @staticmethod
+    def merge(results: Iterable['SearchStats'], best: 'SearchStats' = None) -> 'SearchStats':
+        """
+        Combines the statistics of searches that ran in parallel (e.g. one per root move)
+        :param results: The statistics of each search
+        :param best:    The search whose result is kept, defaults to the best scoring search of :results:
+        :return: The total counters of :results:, with the result of :best:
+        """
+        stats, pick_best = SearchStats(), best is None
+        for result in results:
+            stats.nodes += result.nodes
+            stats.seconds = max(stats.seconds, result.seconds)
+            stats.cutoffs += result.cutoffs
+            stats.first_move_cutoffs += result.first_move_cutoffs
+            stats.table_probes += result.table_probes
+            stats.table_hits += result.table_hits
+            if pick_best and (best is None or result.score > best.score):
+                best = result
+        if best is not None:
+            stats.iterations = [(best.depth, stats.seconds, stats.nodes)]
+            stats.score, stats.move, stats.depth, stats.pv = best.score, best.move, best.depth, best.pv[:]
+        return stats
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def cutoff_rate(self) -> float:
+        """
+        :return: The fraction of nodes where a move caused a beta cutoff
+        """
+        return self.cutoffs / self.nodes if self.nodes else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """
+        :return: The fraction of cutoffs that happened on the first move searched (1 means perfect move ordering)
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def table_hit_rate(self) -> float:
+        return self.table_hits / self.table_probes if self.table_probes else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        :return: The statistics as a JSON serializable dictionary
+        """
+        return {
+            'move': self.move,
+            'score': self.score if abs(self.score) != inf else None,
+            'depth': self.depth,
+            'pv': self.pv,
+            'nodes': self.nodes,
+            'seconds': round(self.seconds, 6),
+            'nps': round(self.nodes_per_second),
+            'cutoff_rate': round(self.cutoff_rate, 4),
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate, 4),
+            'table_hit_rate': round(self.table_hit_rate, 4),
+            'iterations': [{'depth': depth, 'seconds': round(seconds, 6), 'nodes': nodes}
+                           for depth, seconds, nodes in self.iterations]
+        }
+
+    def log(self, source: str, level: int = logging.INFO) -> None:
+        """
+        Writes the statistics to the log as a single JSON line
+        :param source:  What ran the search (e.g. 'negamax' or 'background')
+        :param level:   The logging level of the line
+        :return: None
+        """
+        logging.log(level, f'search {json.dumps({"source": source, **self.as_dict()})}')
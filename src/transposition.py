@@ -0,0 +1,141 @@
+"""
+Module transposition.py
+=======================
+
+This module contains the implementation of the TranspositionTable class, used by the AI to remember positions
+it has already searched
+"""
+from array import array
+from typing import Tuple, Union
+
+__all__ = ['TranspositionTable', 'EXACT', 'LOWER', 'UPPER']
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+Entry = Tuple[int, int, int, int]  # Depth, bound type, score, best move
+
+# Bound types
+EXACT: int = 0
+LOWER: int = 1  # The real score is at least the stored score (The search failed high)
+UPPER: int = 2  # The real score is at most the stored score (The search failed low)
+
+KEY_MASK: int = (1 << 64) - 1
+AGE_MASK: int = 0x3F
+FOLD_MULTIPLIER: int = 0x9E3779B97F4A7C15  # An odd 64-bit constant (2^64 divided by the golden ratio)
+
+
+def fold_key(key: int) -> int:
+    """
+    :param key: A position's key, which has more than 64 bits on boards with more than 64 bits (Including sentinels)
+    :return: :key: hashed down to 64 bits, 64-bit keys are returned as they are
+    """
+    if key <= KEY_MASK:
+        return key
+    folded = 0
+    while key:
+        folded = ((folded ^ (key & KEY_MASK)) * FOLD_MULTIPLIER) & KEY_MASK
+        key >>= 64
+    return folded
+
+
+def previous_prime(n: int) -> int:
+    """
+    :param n:   A positive integer
+    :return: The largest prime number that is not greater than :n: (1 if there isn't one)
+    """
+    for candidate in range(n, 1, -1):
+        if all(candidate % divisor for divisor in range(2, int(candidate ** 0.5) + 1)):
+            return candidate
+    return 1
+
+
+class TranspositionTable:
+    """
+    class TranspositionTable:
+    -------------------------
+
+    A fixed-size hash table of search results, stored in two flat arrays of 64-bit integers so that its memory
+    usage never grows past the size it was created with.
+    The table is made out of buckets of two slots (A two-tier replacement scheme):
+    * The first slot keeps the deepest result, and is only replaced by a deeper search or by a result left over
+      from a previous search
+    * The second slot is always replaced, and receives the entries pushed out of the first slot
+
+    Every entry is packed into a single integer:
+        score (rest) | depth (8 bits) | age (6 bits) | bound type (2 bits) | best move + 1 (8 bits)
+    Keys of boards with more than 64 bits are hashed with fold_key(), so two of their positions can share an entry.
+    """
+    ENTRY_SIZE: int = 2 * array('Q').itemsize  # Bytes per slot (key + data)
+
+    def __init__(self, size_mb: float = 16):
+        if size_mb <= 0:
+            raise ValueError(f'Transposition table size ({size_mb}MB) has to be positive!')
+        # A prime number of buckets spreads keys that only differ in their high bits (Upper columns)
+        self.__buckets: int = previous_prime(int(size_mb * 2 ** 20) // (2 * TranspositionTable.ENTRY_SIZE))
+        self.__keys: array = array('Q', [0]) * (2 * self.__buckets)
+        self.__data: array = array('q', [0]) * (2 * self.__buckets)
+        self.__age: int = 0
+        self.probes: int = 0
+        self.hits: int = 0
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    @property
+    def size_mb(self) -> float:
+        return len(self) * TranspositionTable.ENTRY_SIZE / 2 ** 20
+
+    def new_search(self) -> None:
+        """
+        Marks every entry currently in the table as old, so it can be replaced by the next search
+        :return: None
+        """
+        self.__age = (self.__age + 1) & AGE_MASK
+
+    def clear(self) -> None:
+        """
+        Removes every entry from the table
+        :return: None
+        """
+        self.__keys = array('Q', [0]) * len(self.__keys)
+        self.__data = array('q', [0]) * len(self.__data)
+        self.probes = self.hits = 0
+
+    def get(self, key: int) -> Union[Entry, None]:
+        """
+        :param key: A position's key (BitBoard.key())
+        :return: The depth, bound type, score and best move stored for :key:, None if it isn't in the table
+        """
+        self.probes += 1
+        stored = key if key <= KEY_MASK else fold_key(key)
+        index = 2 * (stored % self.__buckets)
+        if self.__keys[index] != stored:
+            index += 1
+            if self.__keys[index] != stored:
+                return None
+        self.hits += 1
+        data = self.__data[index]
+        return (data >> 16) & 0xFF, (data >> 8) & 0x3, data >> 24, (data & 0xFF) - 1
+
+    def store(self, key: int, depth: int, flag: int, score: int, move: int) -> None:
+        """
+        Saves a search result using the two-tier replacement scheme
+        :param key:     A position's key (BitBoard.key())
+        :param depth:   The depth that the position was searched to
+        :param flag:    The bound type of :score: (EXACT, LOWER or UPPER)
+        :param score:   The score of the position
+        :param move:    The best move found in the position, -1 if there isn't one
+        :return: None
+        """
+        stored = key if key <= KEY_MASK else fold_key(key)
+        index = 2 * (stored % self.__buckets)
+        data = (int(score) << 24) | (min(depth, 0xFF) << 16) | (self.__age << 10) | (flag << 8) | (move + 1)
+        keys, values = self.__keys, self.__data
+        old = values[index]
+        if keys[index] == stored or not keys[index] or \
+                depth >= (old >> 16) & 0xFF or (old >> 10) & AGE_MASK != self.__age:
+            if keys[index] and keys[index] != stored:  # Demote the replaced entry to the always-replace slot
+                keys[index + 1], values[index + 1] = keys[index], old
+            keys[index], values[index] = stored, data
+        else:
+            keys[index + 1], values[index + 1] = stored, data
@@ -0,0 +1,52 @@
+"""
+Module test_evaluation.py
+=========================
+
+Tests that the incremental evaluation (EvalState) always agrees with the full scan of evaluate() and with
+evaluate_batch()
+"""
+import random
+
+import pytest
+
+from src.ai import evaluate, has_won
+from src.bitboard import BitBoard
+from src.evaluation import EvalState
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+np = pytest.importorskip('numpy')
+batch = pytest.importorskip('src.batch')
+
+
+def scores(board: BitBoard) -> tuple:
+    """
+    :param board:   A position with an EvalState attached
+    :return: Its incremental, full scan and batch scores
+    """
+    scanned = board.copy()
+    scanned.evaluation = None
+    return evaluate(board), evaluate(scanned), int(batch.evaluate_batch(batch.to_grids([board]), board.length)[0])
+
+
+@pytest.mark.parametrize('rows, cols, length', [(6, 7, 4), (5, 6, 3), (9, 9, 5)])
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_matches_full_scan(rows: int, cols: int, length: int, seed: int):
+    """
+    Plays a random game, checking the scores after every move and again after undoing every move
+    """
+    rng = random.Random(seed)
+    board = EvalState.attach(BitBoard(rows, cols, length))
+    history = [scores(board)]
+    assert len(set(history[0])) == 1
+    moves = []
+    while not board.is_full() and not (board.played and has_won(board)):
+        column = rng.choice(board.legal_moves())
+        board.play(column)
+        moves.append(column)
+        history.append(scores(board))
+        assert len(set(history[-1])) == 1, f'Moves {moves}'
+    while moves:
+        board.unplay(moves.pop())
+        assert scores(board) == history[len(moves)], f'Undo back to {moves}'
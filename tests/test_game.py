@@ -0,0 +1,36 @@
+"""
+Module test_game.py
+===================
+
+Tests of the Game class's searches
+"""
+from src.arena import EngineConfig
+from src.game import Game
+from src.player import Player
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+def new_game() -> Game:
+    """
+    :return: A new game between two computer players
+    """
+    return Game(6, 7, (Player(1, 'red', False), Player(2, 'yellow', False)))
+
+
+def test_players_dont_share_transposition_tables():
+    """
+    A weak engine searching after a strong one has to search as much as it would in a new game
+    """
+    game, strong, weak = new_game(), EngineConfig('strong', 'expert'), EngineConfig('weak', 'very easy')
+    for column in (3, 3):
+        game.insert(column, game.get_current_player().color)
+    game.insert(strong.choose(game), game.get_current_player().color)
+    weak.choose(game)
+    fresh = new_game()
+    for column in game.moves:
+        fresh.insert(column, fresh.get_current_player().color)
+    weak.choose(fresh)
+    assert game.last_stats.nodes == fresh.last_stats.nodes > 1
+
@@ -0,0 +1,100 @@
+"""
+Module test_parallel.py
+=======================
+
+Tests of the parallel search and of the transposition tables that worker processes (And the solver) keep between
+searches
+"""
+import random
+
+from src import parallel, solver
+from src.analysis import replay
+from src.ai import SearchContext
+from src.bitboard import BitBoard
+from src.constants import MAX_DEPTH
+from src.parallel import parallel_search, search_position, shutdown_pool
+from src.solver import search, solve
+
+__version__ = '0.1'
+__author__ = 'Eric G.D'
+
+
+def random_moves(rng: random.Random, plies: int, rows: int, cols: int) -> list:
+    """
+    :param rng:     The random number generator to use
+    :param plies:   The number of moves
+    :param rows:    The number of rows in the board
+    :param cols:    The number of columns in the board
+    :return: Moves that neither player wins with on a board of connect 3 (Nor of connect 4)
+    """
+    while True:
+        moves, board = [], BitBoard(rows, cols, 3)
+        for _ in range(plies):
+            moves.append(rng.choice(board.legal_moves()))
+            board.play(moves[-1])
+            if board.connected(board.masks[1 - board.player]):
+                break
+        else:
+            return moves
+
+
+def test_worker_table_keeps_win_lengths_apart():
+    """
+    Searching connect 3 positions first doesn't change the results of searching the same moves as connect 4
+    """
+    rng = random.Random(1)
+    positions = [random_moves(rng, 6, 6, 7) for _ in range(10)]
+    parallel._table = None
+    fresh = []
+    for moves in positions:
+        *result, _ = search_position(replay(moves, 6, 7, 4), 5)
+        fresh.append(result)
+        parallel._table = None
+    for moves in positions:
+        search_position(replay(moves, 6, 7, 3), 5)
+    assert [list(search_position(replay(moves, 6, 7, 4), 5)[:2]) for moves in positions] == fresh
+
+
+def test_worker_table_keeps_difficulties_apart():
+    """
+    A deep search doesn't make a shallow search of the same position in the same worker play like it
+    """
+    rng = random.Random(2)
+    positions = [random_moves(rng, 4, 6, 7) for _ in range(10)]
+    fresh = []
+    for moves in positions:
+        parallel._table = None
+        fresh.append(search_position(replay(moves, 6, 7, 4), 1)[:2])
+    for moves, expected in zip(positions, fresh):
+        search_position(replay(moves, 6, 7, 4), 7)
+        assert search_position(replay(moves, 6, 7, 4), 1)[:2] == expected
+
+
+def test_parallel_search_matches_sequential_search():
+    """
+    Searching the moves after the first with its score as their alpha still finds the score of a full search
+    """
+    rng = random.Random(3)
+    try:
+        for plies, depth, time_budget in ((4, 5, None), (6, 6, None), (8, 4, 0.05)):
+            board = replay(random_moves(rng, plies, 6, 7), 6, 7, 4)
+            expected = search(board.copy(), board.legal_moves(), depth, SearchContext(), time_budget)
+            score, move, stats = parallel_search(board, board.legal_moves(), depth, 2, time_budget)
+            if time_budget is None:
+                assert score == expected.score
+            assert board.can_play(move) and stats.move == move and stats.nodes > 0
+        board = replay(random_moves(rng, 6, 4, 5), 4, 5, 4)  # Solved exactly
+        assert parallel_search(board, board.legal_moves(), MAX_DEPTH, 2)[0] == solve(board)[0]
+    finally:
+        shutdown_pool()
+
+
+def test_solver_table_keeps_win_lengths_apart():
+    """
+    Solving a connect 3 position doesn't change the solution of the same board size as connect 4
+    """
+    solver._table = None
+    expected = solve(BitBoard(4, 5, 4))
+    solver._table = None
+    solve(BitBoard(4, 5, 3))
+    assert solve(BitBoard(4, 5, 4)) == expected